@@ -1,16 +1,65 @@
 const express = require('express');
 const axios = require('axios');
+const fs = require('fs');
 const path = require('path');
 
 const router = express.Router();
 
+// Stream PDFs to the Python service instead of sending shared-volume paths,
+// so the two services do not need to share the ./file volume
+const UPLOAD_PDFS = process.env.PYTHON_UPLOAD_PDFS === 'true';
+
+/**
+ * POST a PDF to a Python service endpoint, either by path or as a raw
+ * application/pdf body with the options in the query string. config is
+ * passed on to axios (e.g. a responseType)
+ */
+function postPdf(endpoint, pdfPath, options = {}, config = {}) {
+  const url = `http://python-app:5000/api/${endpoint}`;
+  
+  if (!UPLOAD_PDFS) {
+    return axios.post(url, { pdf_path: pdfPath, ...options }, config);
+  }
+  
+  // Relative paths are relative to the app directory, as in the Python service
+  const filePath = path.isAbsolute(pdfPath) ? pdfPath : path.join('/app', pdfPath);
+  return axios.post(url, fs.createReadStream(filePath), {
+    ...config,
+    params: options,
+    headers: { 'Content-Type': 'application/pdf' },
+    maxBodyLength: Infinity
+  });
+}
+
+/**
+ * Page range options of the Python service; none reads the first page as
+ * a single report
+ */
+function getPageRange(firstPage, lastPage) {
+  const options = {};
+  if (firstPage !== undefined) options.first_page = firstPage;
+  if (lastPage !== undefined) options.last_page = lastPage;
+  return options;
+}
+
+/**
+ * Replace /static/ with /python-static/ in image URLs to match our proxy setup
+ */
+function toNodeUrls(images) {
+  return images.map(image => ({
+    ...image,
+    url: image.url.replace('/static/', '/python-static/')
+  }));
+}
+
 /**
  * Endpoint to convert PDF to image
- * Expects a JSON body with { "pdfPath": "path/to/pdf" }
+ * Expects a JSON body with { "pdfPath": "path/to/pdf" } and optional
+ * { "dpi", "firstPage", "lastPage", "format" } rendering options
  */
 router.post('/convert-pdf', async (req, res) => {
   try {
-    const { pdfPath } = req.body;
+    const { pdfPath, dpi, firstPage, lastPage, format } = req.body;
     
     if (!pdfPath) {
       return res.status(400).json({ error: 'PDF path is required' });
@@ -18,13 +67,18 @@ router.post('/convert-pdf', async (req, res) => {
     
     // Make a request to the Python FastAPI service
     const pythonResponse = await axios.post('http://python-app:5000/api/convert-pdf', {
-      pdf_path: pdfPath
+      pdf_path: pdfPath,
+      dpi,
+      first_page: firstPage,
+      last_page: lastPage,
+      format
     });
     
     // Return the image path from the Python service
     return res.json({ 
       success: true, 
       imagePath: pythonResponse.data.image_path,
+      imagePaths: pythonResponse.data.image_paths,
       message: 'PDF successfully converted to image'
     });
   } catch (error) {
@@ -47,21 +101,20 @@ router.post('/convert-pdf', async (req, res) => {
 
 /**
  * Endpoint to extract text from PDF
- * Expects a JSON body with { "pdfPath": "path/to/pdf" }
+ * Expects a JSON body with { "pdfPath": "path/to/pdf" } and optional
+ * { "firstPage", "lastPage" } to get the details of every report page
  * Returns both structured data and raw text extracted from the PDF
  */
 router.post('/extract-text', async (req, res) => {
   try {
-    const { pdfPath } = req.body;
+    const { pdfPath, firstPage, lastPage } = req.body;
     
     if (!pdfPath) {
       return res.status(400).json({ error: 'PDF path is required' });
     }
     
     // Make a request to the Python FastAPI service
-    const pythonResponse = await axios.post('http://python-app:5000/api/extract-text', {
-      pdf_path: pdfPath
-    });
+    const pythonResponse = await postPdf('extract-text', pdfPath, getPageRange(firstPage, lastPage));
     
     const responseData = pythonResponse.data;
     
@@ -103,21 +156,20 @@ router.post('/extract-text', async (req, res) => {
 
 /**
  * Endpoint to extract visualization images from PDF
- * Expects a JSON body with { "pdfPath": "path/to/pdf" }
+ * Expects a JSON body with { "pdfPath": "path/to/pdf" } and optional
+ * { "firstPage", "lastPage" } to get the images of every report page
  * Returns URLs to access the extracted images
  */
 router.post('/extract-images', async (req, res) => {
   try {
-    const { pdfPath } = req.body;
+    const { pdfPath, firstPage, lastPage } = req.body;
     
     if (!pdfPath) {
       return res.status(400).json({ error: 'PDF path is required' });
     }
     
     // Make a request to the Python FastAPI service
-    const pythonResponse = await axios.post('http://python-app:5000/api/extract-images', {
-      pdf_path: pdfPath
-    });
+    const pythonResponse = await postPdf('extract-images', pdfPath, getPageRange(firstPage, lastPage));
     
     const responseData = pythonResponse.data;
     
@@ -132,14 +184,13 @@ router.post('/extract-images', async (req, res) => {
     
     // Transform the Python static URLs to be accessible through the Node.js app
     if (responseData.data && responseData.data.images) {
-      responseData.data.images = responseData.data.images.map(image => {
-        // Replace /static/ with /python-static/ to match our proxy setup
-        const nodeUrl = image.url.replace('/static/', '/python-static/');
-        return {
-          ...image,
-          url: nodeUrl
-        };
-      });
+      responseData.data.images = toNodeUrls(responseData.data.images);
+    }
+    if (responseData.data && responseData.data.pages) {
+      responseData.data.pages = responseData.data.pages.map(page => ({
+        ...page,
+        images: page.images && toNodeUrls(page.images)
+      }));
     }
     
     // Return the image data from the Python service with updated URLs
@@ -166,6 +217,56 @@ router.post('/extract-images', async (req, res) => {
   }
 });
 
+/**
+ * Endpoint to read the numeric sensitivity and deviation grids of a PDF
+ * Expects a JSON body with { "pdfPath": "path/to/pdf" } and optional
+ * { "delivery": "json" | "binary", "dtype": "float32" | "int8" }; binary
+ * responses are passed through with their X-Grid-* headers
+ */
+router.post('/extract-grids', async (req, res) => {
+  try {
+    const { pdfPath, delivery, dtype } = req.body;
+    
+    if (!pdfPath) {
+      return res.status(400).json({ error: 'PDF path is required' });
+    }
+    
+    if (delivery === 'binary') {
+      const pythonResponse = await postPdf('extract-grids', pdfPath, { delivery, dtype },
+                                           { responseType: 'arraybuffer' });
+      
+      res.set('Content-Type', 'application/octet-stream');
+      for (const header of ['x-grid-dtype', 'x-grid-shapes', 'x-grid-status']) {
+        res.set(header, pythonResponse.headers[header]);
+      }
+      return res.send(Buffer.from(pythonResponse.data));
+    }
+    
+    const pythonResponse = await postPdf('extract-grids', pdfPath);
+    
+    return res.json({
+      success: true,
+      data: pythonResponse.data.data,
+      message: pythonResponse.data.message
+    });
+  } catch (error) {
+    console.error('Error extracting grids from PDF:', error.message);
+    
+    // Binary requests get their error body as a buffer too
+    if (error.response && error.response.data) {
+      return res.status(error.response.status || 500).json({
+        success: false,
+        error: 'Error extracting grids from PDF'
+      });
+    }
+    
+    return res.status(500).json({
+      success: false,
+      error: 'Failed to extract grids from PDF'
+    });
+  }
+});
+
 /**
  * Endpoint to import and process a PDF - combines text extraction and image extraction
  * Expects a JSON body with { "pdfPath": "path/to/pdf" }
@@ -184,46 +285,45 @@ router.post('/import-test', async (req, res) => {
     let imagesData = { data: { images: [] }, message: 'Image extraction failed' };
     let textError = null;
     let imagesError = null;
+    let preview = null;
     
     try {
-      // Call text extraction API
-      const textResponse = await axios.post('http://python-app:5000/api/extract-text', { pdf_path: pdfPath });
-      textData = textResponse.data;
-      // Ensure we're handling the text data correctly
-      if (!textData.data || !textData.data.text) {
-        console.warn('Text extraction returned unexpected format:', textData);
-        // Try to normalize the response if possible
-        if (textData.data && typeof textData.data === 'object') {
-          textData = { 
-            data: { text: textData.data },
-            message: textData.message || 'Text extracted with unexpected format'
-          };
-        }
+      // Call the combined analysis API, which opens and renders the PDF once
+      // for both text and images
+      const analyzeResponse = await postPdf('analyze', pdfPath);
+      const analyzeData = analyzeResponse.data;
+      
+      if (!analyzeData.data || !analyzeData.data.text) {
+        console.warn('Analysis returned unexpected format:', analyzeData);
       }
-    } catch (error) {
-      console.error('Error in text extraction:', error.message);
-      textError = error.response?.data?.detail || error.message;
-    }
-    
-    try {
-      // Call image extraction API
-      const imagesResponse = await axios.post('http://python-app:5000/api/extract-images', { pdf_path: pdfPath });
-      imagesData = imagesResponse.data;
+      
+      textData = {
+        data: { text: analyzeData.data?.text || {} },
+        message: analyzeData.text_message || analyzeData.message
+      };
       
       // Transform the Python static URLs to be accessible through the Node.js app
-      if (imagesData.data && imagesData.data.images) {
-        imagesData.data.images = imagesData.data.images.map(image => {
-          // Replace /static/ with /python-static/ to match our proxy setup
-          const nodeUrl = image.url.replace('/static/', '/python-static/');
-          return {
+      imagesData = {
+        data: {
+          images: (analyzeData.data?.images || []).map(image => ({
             ...image,
-            url: nodeUrl
-          };
-        });
+            // Replace /static/ with /python-static/ to match our proxy setup
+            url: image.url.replace('/static/', '/python-static/')
+          }))
+        },
+        message: analyzeData.image_message || analyzeData.message
+      };
+      
+      if (analyzeData.data?.preview) {
+        preview = {
+          ...analyzeData.data.preview,
+          url: analyzeData.data.preview.url.replace('/static/', '/python-static/')
+        };
       }
     } catch (error) {
-      console.error('Error in image extraction:', error.message);
-      imagesError = error.response?.data?.detail || error.message;
+      console.error('Error in PDF analysis:', error.message);
+      textError = error.response?.data?.detail || error.message;
+      imagesError = textError;
     }
     
     // Check if both requests failed completely
@@ -256,7 +356,8 @@ router.post('/import-test', async (req, res) => {
       success: Boolean(textSuccess || imageSuccess),
       data: {
         text: textData.data?.text || {},
-        images: imagesData.data?.images || []
+        images: imagesData.data?.images || [],
+        preview
       },
       pdf_path: pdfPath,
       textMessage: textData.message || (textError ? `Error: ${textError}` : 'No text data available'),
@@ -274,4 +375,77 @@ router.post('/import-test', async (req, res) => {
   }
 });
 
+/**
+ * Endpoint to queue a background extraction job
+ * Expects a JSON body with { "pdfPath": "path/to/pdf" } and optional
+ * { "extract", "options", "callbackUrl" }; returns the job without waiting
+ * for the extraction
+ */
+router.post('/jobs', async (req, res) => {
+  try {
+    const { pdfPath, extract, options, callbackUrl } = req.body;
+    
+    if (!pdfPath) {
+      return res.status(400).json({ error: 'PDF path is required' });
+    }
+    
+    const pythonResponse = await axios.post('http://python-app:5000/api/jobs', {
+      pdf_path: pdfPath,
+      extract,
+      options,
+      callback_url: callbackUrl
+    });
+    
+    return res.status(202).json({
+      success: true,
+      data: pythonResponse.data.data,
+      message: pythonResponse.data.message
+    });
+  } catch (error) {
+    console.error('Error queueing PDF job:', error.message);
+    
+    if (error.response && error.response.data) {
+      return res.status(error.response.status || 500).json({
+        success: false,
+        error: error.response.data.detail || 'Error queueing PDF job'
+      });
+    }
+    
+    return res.status(500).json({
+      success: false,
+      error: 'Failed to queue PDF job'
+    });
+  }
+});
+
+/**
+ * Endpoint to poll a background extraction job
+ * Returns its status, and its result once finished
+ */
+router.get('/jobs/:id', async (req, res) => {
+  try {
+    const pythonResponse = await axios.get(`http://python-app:5000/api/jobs/${encodeURIComponent(req.params.id)}`);
+    
+    return res.json({
+      success: true,
+      data: pythonResponse.data.data,
+      message: pythonResponse.data.message
+    });
+  } catch (error) {
+    console.error('Error fetching PDF job:', error.message);
+    
+    if (error.response && error.response.data) {
+      return res.status(error.response.status || 500).json({
+        success: false,
+        error: error.response.data.detail || 'Error fetching PDF job'
+      });
+    }
+    
+    return res.status(500).json({
+      success: false,
+      error: 'Failed to fetch PDF job'
+    });
+  }
+});
+
 module.exports = router; 
\ No newline at end of file
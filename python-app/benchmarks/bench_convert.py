@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Benchmark for /api/convert-pdf page rendering.
+
+Compares in-process PyMuPDF rendering (utils.image_extractor.convert_pdf_pages)
+with the previous pdf2image path, which forks pdftoppm and writes temporary
+PPM files. Fork overhead shows up as child-process CPU time. The poppler
+path is skipped when pdf2image or pdftoppm is not installed.
+
+Usage: python -m benchmarks.bench_convert <pdf file> [repeat] [dpi]
+"""
+import os
+import resource
+import sys
+import tempfile
+import time
+
+from utils.image_extractor import convert_pdf_pages
+
+
+def poppler_convert(pdf_file, output_dir, dpi):
+    """
+    The previous /api/convert-pdf implementation
+    """
+    from pdf2image import convert_from_path
+
+    images = convert_from_path(pdf_file, dpi=dpi, first_page=1, last_page=1)
+    output_image_path = os.path.join(output_dir, f"converted_{int(time.time())}.jpg")
+    images[0].save(output_image_path, 'JPEG')
+    return [output_image_path]
+
+
+def fitz_convert(pdf_file, output_dir, dpi):
+    return convert_pdf_pages(pdf_file, output_dir, dpi=dpi)
+
+
+def measure(func, pdf_file, output_dir, dpi, repeat):
+    children_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    start = time.perf_counter()
+
+    for _ in range(repeat):
+        func(pdf_file, output_dir, dpi)
+
+    elapsed = time.perf_counter() - start
+    children_after = resource.getrusage(resource.RUSAGE_CHILDREN)
+    child_cpu = ((children_after.ru_utime - children_before.ru_utime)
+                 + (children_after.ru_stime - children_before.ru_stime))
+
+    return {
+        "latency_ms": elapsed / repeat * 1000,
+        "child_cpu_ms": child_cpu / repeat * 1000,
+    }
+
+
+def run(pdf_file, repeat=10, dpi=200):
+    results = {}
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        results["pymupdf"] = measure(fitz_convert, pdf_file, output_dir, dpi, repeat)
+
+        try:
+            results["poppler"] = measure(poppler_convert, pdf_file, output_dir, dpi, repeat)
+        except Exception as e:
+            print(f"Skipping poppler path: {e}")
+
+    return results
+
+
+if __name__ == "__main__":
+    pdf_file = sys.argv[1]
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    dpi = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+
+    for name, row in run(pdf_file, repeat, dpi).items():
+        print(f"{name:<8} latency {row['latency_ms']:8.2f} ms  "
+              f"child process cpu {row['child_cpu_ms']:7.2f} ms")
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Benchmark for region image encoding in utils.image_extractor.
+
+Crops the regions of a report once, then encodes them with each encoder
+setting, one after another and concurrently on a thread pool, reporting
+bytes written and encode time.
+
+Usage: python -m benchmarks.bench_encode <pdf file> [repeat]
+"""
+import io
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.image_extractor import (
+    DEFAULT_ENCODER, REGIONS, WRITE_THREADS, crop_region, encode_image, render_regions, scale_regions
+)
+
+SETTINGS = [
+    ("png level 1", {"compress_level": 1}),
+    ("png level 6 (default)", {}),
+    ("png level 9", {"compress_level": 9}),
+    ("png 16 colors", {"colors": 16}),
+    ("png 64 colors", {"colors": 64}),
+    ("webp quality 80", {"format": "webp", "quality": 80}),
+    ("jpeg quality 85", {"format": "jpeg", "quality": 85}),
+]
+
+
+def encode_all(crops, encoder, threads):
+    def encode(image):
+        buffer = io.BytesIO()
+        encode_image(image, buffer, encoder)
+        return buffer.getbuffer().nbytes
+
+    if threads > 1:
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            return sum(pool.map(encode, crops))
+    return sum(map(encode, crops))
+
+
+def time_encode(crops, encoder, threads, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        total_bytes = encode_all(crops, encoder, threads)
+    return total_bytes, (time.perf_counter() - start) / repeat
+
+
+def run(pdf_file, repeat=5):
+    image, origin, page_size = render_regions(pdf_file, REGIONS)
+    crops = [crop_region(image, region, page_size, origin) for region in scale_regions(REGIONS)]
+
+    results = []
+    for name, settings in SETTINGS:
+        encoder = dict(DEFAULT_ENCODER, **settings)
+        total_bytes, serial_time = time_encode(crops, encoder, 1, repeat)
+        _, threaded_time = time_encode(crops, encoder, WRITE_THREADS, repeat)
+        results.append({
+            "setting": name,
+            "bytes": total_bytes,
+            "serial_ms": serial_time * 1000,
+            "threaded_ms": threaded_time * 1000,
+        })
+
+    return results
+
+
+if __name__ == "__main__":
+    pdf_file = sys.argv[1]
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    for row in run(pdf_file, repeat):
+        print(json.dumps(row))
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Benchmark for utils.text_extractor.get_text_from_pdf.
+
+Runs the compiled parser and the original line-by-line parser over a
+generated corpus of report texts (plus the text of any PDFs given on the
+command line), checks that both give identical output wherever the original
+parser succeeds, and reports lines parsed per second for each.
+
+Usage: python -m benchmarks.bench_parser [reports] [pdf files...]
+"""
+import json
+import random
+import re
+import sys
+import time
+
+from utils.text_extractor import convert_pdf_to_txt, get_text_from_pdf
+
+
+def legacy_get_text_from_pdf(lines):
+    """
+    The original parser, kept here as the baseline.
+    """
+    patient_details = {
+        "Patient": None,
+        "Date of Birth": None,
+        "Gender": None,
+        "Patient ID": None,
+        "Office Location": None,
+        "Test Type": None,
+        "Created": None,
+        "Fixation Monitor": None,
+        "Fixation Target": None,
+        "Fixation Losses": None,
+        "False POS Errors": None,
+        "False NEG Errors": None,
+        "Test Duration": None,
+        "Fovea": None,
+        "Stimulus": None,
+        "Background": None,
+        "Strategy": None,
+        "Pupil Diameter": None,
+        "Visual Acuity": None,
+        "Rx": None,
+        "Date": None,
+        "Time": None,
+        "Age": None,
+        # Additional fields that might be present in PDFs
+        "Eye": None,
+        "Grid": None,
+        "MD10-2": None,
+        "PSD10-2": None,
+        "SF": None,
+        "CPSD": None,
+        # Other possible visual field metrics
+        "MD": None,
+        "PSD": None,
+        "VFI": None,
+        "GHT": None,
+    }
+    emptyString = ""
+
+    lines = lines.decode("utf-8")
+    lines = lines.splitlines()
+    # print(lines)
+    i = 0
+    while i < len(lines):
+        if ":" in lines[i]:
+            newData = lines[i].split(":", 1)
+            if newData[1].strip() != emptyString:
+                if newData[0] in patient_details.keys():
+                    if not re.search(r"/\d+/", newData[0]):
+                        answer = newData[1].replace(",", "")
+                        answer = answer.strip()
+                        patient_details[newData[0]] = answer
+                i = i + 1
+            else:
+                tempArray = []
+                if lines[i + 1].strip()[len(lines[i + 1].strip()) - 1] == ":":
+                    while True:
+                        nextData = lines[i].split(":")
+                        tempArray.append(nextData[0])
+                        i = i + 1
+                        if lines[i][len(lines[i].strip()) - 1] != ":":
+                            break
+
+                    for data in tempArray:
+                        if data in patient_details.keys():
+                            if not re.search(r"/\d+/", data):
+                                if data == "Pupil Diameter":
+                                    if "mm" in lines[i]:
+                                        answer = lines[i].replace(",", "")
+                                        answer = answer.strip()
+                                        patient_details[data] = answer
+                                        i = i + 1
+                                else:
+                                    answer = lines[i].replace(",", "")
+                                    answer = answer.strip()
+                                    patient_details[data] = answer
+                                    i = i + 1
+                    tempArray.clear()
+                else:
+                    if "dB" in lines[i+1]:
+                        answer = str(re.match("(.*?)dB", lines[i + 1]).group())
+                    else:
+                        answer = lines[i+1]
+                    answer = answer.replace(",", "")
+                    answer = answer.strip()
+                    patient_details[newData[0]] = answer
+                    i = i + 1
+        else:
+            pattern = r"[0-9]+[ |[a-zà-ú.,-]* ((highway)|(autoroute)|(north)|" \
+                    r"(nord)|(south)|(sud)|(east)|(est)|(west)|(ouest)|(avenue)|" \
+                    r"(lane)|(voie)|(ruelle)|(road)|(rue)|(route)|(drive)|" \
+                    r"(boulevard)|(circle)|(cercle)|(street)|(cer\.)|(cir\.)|" \
+                    r"(blvd\.)|(hway\.)|(st\.)|(aut\.)|(ave\.)|(ln\.)|(rd\.)|" \
+                    r"(hw\.)|(dr\.)|(a\.))([ .,-]*[a-zà-ú0-9]*)*"
+            match = re.match(pattern, lines[i], re.IGNORECASE)
+            if match:
+                patient_details["Office Location"] = match.group()
+                tempString = lines[i+1]+" "+lines[i+2]+" "+lines[i+3]
+                if(re.match("(^|OS|OD).+(Test|$)",tempString)):
+                    tempEyeAndGridArray = tempString.split("Single Field Analysis")
+                    patient_details["Eye"] = tempEyeAndGridArray[0].strip()
+                    patient_details["Test Type"] = tempEyeAndGridArray[1].strip()
+                    patient_details["Grid"] = tempEyeAndGridArray[1].strip().split(" ")[1].strip()
+            
+            # Check for visual field metrics (MD, PSD, etc.)
+            for metric in ["MD", "PSD", "VFI", "SF", "CPSD", "MD10-2", "PSD10-2"]:
+                if metric in lines[i]:
+                    # Try to extract the value with dB unit
+                    match = re.search(r'{}[:\s]*([-+]?\d+\.\d+)\s*dB'.format(metric), lines[i], re.IGNORECASE)
+                    if match:
+                        patient_details[metric] = match.group(1) + " dB"
+            
+            i = i + 1
+
+    if patient_details["Patient ID"]:
+        # response = {'status': True, 'data': json.dumps(patient_details)}
+        response = "[(1)]" + json.dumps(patient_details)
+        return response
+    else:
+        # response = {'status': False, 'data': json.dumps(patient_details)}
+        response = "[(0)]" + json.dumps(patient_details)
+        return response
+
+
+# Label lines, label blocks and free-text lines seen in real reports
+LABELS = ["Patient", "Date of Birth", "Gender", "Patient ID", "Created",
+          "Fixation Losses", "False POS Errors", "False NEG Errors",
+          "Test Duration", "Fovea", "Stimulus", "Background", "Strategy",
+          "Visual Acuity", "Rx", "Date", "Time", "Age", "GHT", "Comments"]
+
+NOISE = ["Total Deviation", "Pattern Deviation", "<= 0.5%", "< 1%", "< 2%",
+         "Threshold (dB)", "Humphrey Field Analyzer", "Reliability indices",
+         "Within Normal Limits", ":: ::", "Page 1/2", "12/03/2024"]
+
+
+def make_report(rnd):
+    """
+    Text of one synthetic report, shaped like convert_pdf_to_txt output
+    """
+    lines = []
+    for label in rnd.sample(LABELS, rnd.randint(8, len(LABELS))):
+        value = rnd.choice(["Doe, John", "01-02-1950", "Male", str(rnd.randint(1, 99999)),
+                            "0/14", "2%", "05:12", "OFF", "III, White", "31.5 ASB",
+                            "SITA-Standard", "20/20", "+1.00 DS", "74", ""])
+        lines.append(f"{label}: {value}")
+        if not value:
+            lines.append(rnd.choice(["-2.34 dB P < 5%", "Outside Normal Limits", "3 mm"]))
+
+    # Label blocks whose values follow the block
+    lines += ["Fixation Monitor:", "Fixation Target:", "Pupil Diameter:",
+              "Gaze/Blind Spot", "Central", f"{rnd.randint(2, 7)}.{rnd.randint(0, 9)} mm"]
+
+    lines += [f"{rnd.randint(1, 9999)} {rnd.choice(['Main', 'Oak', 'Elm'])} "
+              f"{rnd.choice(['Street', 'Avenue', 'rd.', 'Boulevard'])}",
+              rnd.choice(["OD", "OS"]), "Single Field Analysis",
+              rnd.choice(["Central 24-2 Threshold Test", "Central 10-2 Threshold Test"])]
+
+    for metric in ["VFI", "MD", "PSD", "MD10-2", "PSD10-2", "SF", "CPSD"]:
+        if rnd.random() < 0.6:
+            lines.append(f"{metric} {rnd.uniform(-30, 10):.2f} dB P < {rnd.choice([1, 2, 5])}%")
+
+    lines += [rnd.choice(NOISE) for _ in range(rnd.randint(20, 120))]
+    lines += [str(rnd.randint(-35, 40)) for _ in range(rnd.randint(50, 200))]
+
+    # Mix the free-text lines in with the labels
+    tail = lines[-60:]
+    rnd.shuffle(tail)
+    lines[-60:] = tail
+
+    # Keep enough trailing lines for the parsers' lookahead, except in a few
+    # reports that end abruptly
+    if rnd.random() < 0.9:
+        lines += ["", "End of report", "End of report", "End of report"]
+    else:
+        lines = lines[:rnd.randint(1, len(lines))]
+    return ("\n".join(lines) + "\f").encode("utf8")
+
+
+def parse(parser, text):
+    """
+    Parser output, or the type of exception it raised
+    """
+    try:
+        return parser(text)
+    except Exception as e:
+        return type(e).__name__
+
+
+def time_parser(parser, corpus, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in corpus:
+            parser(text)
+    return time.perf_counter() - start
+
+
+def run(reports=200, pdf_files=(), repeat=3, seed=0):
+    rnd = random.Random(seed)
+    corpus = [make_report(rnd) for _ in range(reports)]
+    corpus += [convert_pdf_to_txt(pdf_file) for pdf_file in pdf_files]
+
+    # Both parsers must agree on every text the original parser handles;
+    # it raises IndexError on labels at the end of the page, which are now empty
+    legacy_outputs = [parse(legacy_get_text_from_pdf, text) for text in corpus]
+    mismatches = sum(legacy != parse(get_text_from_pdf, text)
+                     for legacy, text in zip(legacy_outputs, corpus)
+                     if legacy != "IndexError")
+    if mismatches:
+        raise AssertionError(f"get_text_from_pdf output differs on {mismatches} texts")
+
+    # Time only the texts both parsers handle
+    corpus = [text for legacy, text in zip(legacy_outputs, corpus)
+              if legacy.startswith("[(") and parse(get_text_from_pdf, text).startswith("[(")]
+    total_lines = sum(len(text.splitlines()) for text in corpus) * repeat
+
+    legacy_time = time_parser(legacy_get_text_from_pdf, corpus, repeat)
+    new_time = time_parser(get_text_from_pdf, corpus, repeat)
+
+    return {
+        "texts": len(corpus),
+        "lines": total_lines,
+        "legacy_lines_per_second": total_lines / legacy_time,
+        "new_lines_per_second": total_lines / new_time,
+        "speedup": legacy_time / new_time,
+    }
+
+
+if __name__ == "__main__":
+    reports = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    print(json.dumps(run(reports, sys.argv[2:]), indent=2))
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for utils.image_extractor.trim_whitespace.
+
+Compares the bounding-box implementation against the original per-pixel
+loop on crops shaped like the ones cut from a 2x zoom report render.
+
+Usage: python -m benchmarks.bench_trim [repeat]
+"""
+import sys
+import time
+from PIL import Image, ImageDraw
+
+from utils.image_extractor import trim_whitespace
+
+
+def legacy_trim_whitespace(image):
+    """
+    The original per-pixel implementation, kept here as the baseline.
+    """
+    if image.mode != 'RGBA':
+        image = image.convert('RGBA')
+    
+    bg = Image.new('RGBA', image.size, (255, 255, 255, 0))
+    bg.paste(image, (0, 0), image)
+    data = bg.getdata()
+    
+    non_empty_columns = []
+    non_empty_rows = []
+    
+    for y in range(image.height):
+        for x in range(image.width):
+            if data[y * image.width + x][3] > 0:
+                non_empty_rows.append(y)
+                non_empty_columns.append(x)
+    
+    if not non_empty_rows or not non_empty_columns:
+        return image
+    
+    min_x = max(0, min(non_empty_columns) - 2)
+    max_x = min(image.width, max(non_empty_columns) + 2)
+    min_y = max(0, min(non_empty_rows) - 2)
+    max_y = min(image.height, max(non_empty_rows) + 2)
+    
+    return image.crop((min_x, min_y, max_x, max_y))
+
+
+def make_crop(size, ellipse):
+    """
+    Build a masked RGBA crop like the ones produced by the region extractors
+    """
+    img = Image.effect_noise(size, 64).convert('RGB')
+    mask = Image.new('L', size)
+    ImageDraw.Draw(mask).ellipse(ellipse, fill=255)
+    img.putalpha(mask)
+    return img
+
+
+def time_call(func, image, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func(image)
+    return (time.perf_counter() - start) / repeat, result
+
+
+def run(repeat=3):
+    # Crop sizes taken from a 1224x1584 (2x zoom letter page) render
+    cases = [
+        ("gray_scale", make_crop((751, 1154), (0, 0, 382, 390))),
+        ("total_deviation_values", make_crop((1283, 823), (0, 0, 260, 270))),
+        ("legend", make_crop((130, 130), (0, 0, 130, 130))),
+    ]
+    
+    results = []
+    for name, image in cases:
+        legacy_time, legacy_result = time_call(legacy_trim_whitespace, image, repeat)
+        new_time, new_result = time_call(trim_whitespace, image, repeat)
+        
+        # Both implementations must produce the same crop
+        if legacy_result.size != new_result.size or legacy_result.tobytes() != new_result.tobytes():
+            raise AssertionError(f"trim_whitespace output differs for {name}")
+        
+        results.append({
+            "region": name,
+            "crop_size": image.size,
+            "legacy_ms": legacy_time * 1000,
+            "new_ms": new_time * 1000,
+            "speedup": legacy_time / new_time if new_time else float("inf"),
+        })
+    
+    return results
+
+
+if __name__ == "__main__":
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    
+    for row in run(repeat):
+        print(f"{row['region']:<24} {str(row['crop_size']):<14} "
+              f"legacy {row['legacy_ms']:9.2f} ms  new {row['new_ms']:7.2f} ms  "
+              f"x{row['speedup']:.0f}")
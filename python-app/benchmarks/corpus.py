@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Synthetic visual field report PDFs for the benchmarks.
+
+Reports are drawn with PyMuPDF on a US letter page. The plots are placed
+from REGIONS, so the crops of utils.image_extractor land on them, and the
+header uses the labels get_text_from_pdf looks for. Every report is
+different but fully determined by its seed.
+
+Usage: python -m benchmarks.corpus <output dir> [reports] [pages] [seed]
+"""
+import os
+import random
+import sys
+
+import fitz
+
+from utils.image_extractor import REGIONS, get_region_rect
+
+# US letter, in points
+PAGE_WIDTH = 612
+PAGE_HEIGHT = 792
+
+# Test points of the 24-2 pattern of a right eye, in degrees from fixation
+# (x to the right, y up): a 6 degree lattice with the nasal step at -27
+GRID_24_2 = tuple(
+    (x, y)
+    for y in (21, 15, 9, 3, -3, -9, -15, -21)
+    for x in (-27, -21, -15, -9, -3, 3, 9, 15, 21)
+    if abs(x) <= {21: 9, 15: 15, 9: 21, 3: 21}[abs(y)] or (x, abs(y)) == (-27, 3)
+)
+
+# Test points on the blind spot, left blank on the deviation plots
+BLIND_SPOT = ((15, 3), (15, -3))
+
+# Eccentricity, in degrees, at the edge of the printed plots
+PLOT_DEGREES = 30
+
+# Regions whose plots print numeric values, and the range of those values
+VALUE_REGIONS = {
+    "sensitivity_values": (0, 35),
+    "total_deviation_values": (-30, 5),
+    "pattern_deviation_values": (-30, 5),
+}
+
+# Regions whose plots show probability symbols
+SYMBOL_REGIONS = ("td_probability_values", "pd_probability_values")
+
+
+def get_grid_points(center, radius, eye="OD", blind_spot=True):
+    """
+    Positions (in points) of the 24-2 test points of eye on a plot of
+    radius around center; the left eye's pattern is the right eye's mirrored
+    """
+    cx, cy = center
+    scale = radius / PLOT_DEGREES
+    mirror = 1 if eye == "OD" else -1
+    return [
+        (cx + mirror * x * scale, cy - y * scale)
+        for x, y in GRID_24_2
+        if blind_spot or (x, y) not in BLIND_SPOT
+    ]
+
+
+def get_plot_geometry(region):
+    """
+    Rectangle of a region's mask shape on the page, in points
+    """
+    return fitz.Rect(get_region_rect(region))
+
+
+def draw_header(page, rnd, seed, eye):
+    """
+    Patient and test details, one label per line like the printed reports
+    """
+    y = 40
+
+    def line(text, x=36):
+        nonlocal y
+        page.insert_text((x, y), text, fontsize=8)
+        y += 10
+
+    line(f"Patient: {rnd.choice(['Doe', 'Roe', 'Smith', 'Garcia'])}, {rnd.choice(['John', 'Jane', 'Alex'])}")
+    line(f"Patient ID: {10000 + seed}")
+    line(f"Date of Birth: {rnd.randint(1, 28):02d}-{rnd.randint(1, 12):02d}-{rnd.randint(1930, 2000)}")
+    line(f"Gender: {rnd.choice(['Male', 'Female'])}")
+    line(f"{rnd.randint(1, 9999)} {rnd.choice(['Main', 'Oak', 'Elm'])} {rnd.choice(['Street', 'Avenue', 'Boulevard'])}")
+    line(eye)
+    line("Single Field Analysis")
+    line("Central 24-2 Threshold Test")
+    line("Fixation Monitor:")
+    line("Fixation Target:")
+    line("Gaze/Blind Spot")
+    line("Central")
+    line(f"Fixation Losses: {rnd.randint(0, 5)}/14")
+    line(f"False POS Errors: {rnd.randint(0, 15)}%")
+    line(f"False NEG Errors: {rnd.randint(0, 15)}%")
+    line(f"Test Duration: {rnd.randint(3, 8):02d}:{rnd.randint(0, 59):02d}")
+    line("Fovea: OFF")
+    line("Stimulus: III, White")
+    line("Background: 31.5 ASB")
+    line("Strategy: SITA-Standard")
+    line("Pupil Diameter:")
+    line(f"{rnd.randint(2, 7)}.{rnd.randint(0, 9)} mm")
+    line("Visual Acuity: 20/20")
+    line("Rx: +1.00 DS")
+    line(f"Date: {rnd.randint(1, 28):02d}-{rnd.randint(1, 12):02d}-2024")
+    line(f"Time: {rnd.randint(1, 12)}:{rnd.randint(0, 59):02d} AM")
+    line(f"Age: {rnd.randint(20, 90)}")
+    line(f"VFI {rnd.randint(50, 100)}%")
+    line(f"MD {rnd.uniform(-20, 2):.2f} dB P < {rnd.choice([1, 2, 5])}%")
+    line(f"PSD {rnd.uniform(0, 15):.2f} dB")
+
+
+def draw_plots(page, rnd, eye):
+    """
+    Plots at the REGIONS positions: a shaded disc for the gray scale, 24-2
+    value grids, probability symbols and a legend box. Sensitivities are
+    printed on every test point ("<0" for no response); the other plots
+    leave the blind spot blank.
+    """
+    for region in REGIONS:
+        rect = get_plot_geometry(region)
+
+        if region["mask"] == "rectangle":
+            page.draw_rect(rect + (4, 4, -4, -4), color=(0, 0, 0), fill=(0.5, 0.5, 0.5))
+            continue
+
+        center = (rect.x0 + rect.width / 2, rect.y0 + rect.height / 2)
+        radius = min(rect.width, rect.height) / 2 - 8
+        page.draw_circle(center, radius, color=(0, 0, 0),
+                         fill=None if region["type"] != "gray_scale" else (rnd.random(),) * 3)
+
+        if region["type"] in VALUE_REGIONS:
+            low, high = VALUE_REGIONS[region["type"]]
+            sensitivity = region["type"] == "sensitivity_values"
+            for x, y in get_grid_points(center, radius, eye, blind_spot=sensitivity):
+                text = str(rnd.randint(low, high))
+                if sensitivity and rnd.random() < 0.05:
+                    text = "<0"
+                # Center the value on its test point
+                width = fitz.get_text_length(text, fontsize=6)
+                page.insert_text((x - width / 2, y + 2), text, fontsize=6)
+        elif region["type"] in SYMBOL_REGIONS:
+            for x, y in get_grid_points(center, radius, eye, blind_spot=False):
+                shade = rnd.choice([1, 0.7, 0.4, 0])
+                page.draw_rect(fitz.Rect(x - 3, y - 3, x + 3, y + 3), color=None, fill=(shade,) * 3)
+
+
+def make_report_pdf(path=None, seed=0, pages=1):
+    """
+    Build one synthetic report, saving it to path. Returns the PDF bytes
+    when path is None.
+    """
+    rnd = random.Random(seed)
+    doc = fitz.open()
+
+    for page_number in range(pages):
+        page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+        eye = "OD" if page_number % 2 == 0 else "OS"
+        draw_header(page, rnd, seed, eye)
+        draw_plots(page, rnd, eye)
+
+    try:
+        if path is None:
+            return doc.tobytes()
+        doc.save(path)
+        return path
+    finally:
+        doc.close()
+
+
+def make_corpus(output_dir, reports=20, pages=1, seed=0):
+    """
+    Write reports synthetic PDFs to output_dir and return their paths
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    return [
+        make_report_pdf(os.path.join(output_dir, f"report_{seed + index:05d}.pdf"), seed + index, pages)
+        for index in range(reports)
+    ]
+
+
+if __name__ == "__main__":
+    output_dir = sys.argv[1]
+    reports = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    pages = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+    seed = int(sys.argv[4]) if len(sys.argv) > 4 else 0
+
+    for path in make_corpus(output_dir, reports, pages, seed):
+        print(path)
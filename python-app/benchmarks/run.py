@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the extraction paths.
+
+Generates a synthetic report corpus (benchmarks.corpus), times
+convert_pdf_to_txt, get_text_from_pdf, extract_text_from_pdf,
+find_report_pages, extract_grids_from_pdf, convert_pdf2img,
+trim_whitespace and extract_images_from_pdf on it, times importing the
+app, then drives the FastAPI app over HTTP with concurrent clients. All timings are written to a JSON file; pass an
+earlier file with --compare to flag regressions.
+
+Without --url a uvicorn server is started on a free local port for the
+HTTP benchmarks, once /ready reports it warmed up; --http-requests 0
+skips them.
+
+Usage: python -m benchmarks.run [--reports N] [--pages N] [--repeat N]
+                                [--http-requests N] [--concurrency N]
+                                [--url URL] [--upload] [--output FILE]
+                                [--compare FILE] [--threshold RATIO]
+"""
+import argparse
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import fitz
+import PIL
+
+from benchmarks.corpus import make_corpus
+from utils.image_extractor import (
+    REGIONS, convert_pdf2img, extract_images_from_pdf, get_crop_box, get_region_mask, scale_regions,
+    trim_whitespace
+)
+from utils.grid_extractor import extract_grids_from_pdf
+from utils.text_extractor import (
+    convert_pdf_to_str, convert_pdf_to_txt, extract_text_from_pdf, find_report_pages, get_text_from_pdf
+)
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Endpoints driven by the HTTP benchmark, with their JSON options
+HTTP_ENDPOINTS = {
+    "extract-text": {},
+    "extract-images": {},
+    "analyze": {},
+    "extract-grids": {},
+}
+
+
+def summarize(samples):
+    """
+    Timing statistics, in milliseconds, of a list of durations in seconds
+    """
+    samples = sorted(samples)
+    return {
+        "runs": len(samples),
+        "mean_ms": statistics.mean(samples) * 1000,
+        "median_ms": statistics.median(samples) * 1000,
+        "p90_ms": samples[int(0.9 * (len(samples) - 1))] * 1000,
+        "min_ms": samples[0] * 1000,
+        "max_ms": samples[-1] * 1000,
+    }
+
+
+def time_each(fn, items, repeat):
+    """
+    Time fn(item) for every item, repeat times, after one warm-up call
+    """
+    fn(items[0])
+
+    samples = []
+    for _ in range(repeat):
+        for item in items:
+            start = time.perf_counter()
+            fn(item)
+            samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def get_untrimmed_crops(pdf_file):
+    """
+    Masked region crops of a report, as handed to trim_whitespace
+    """
+    image = convert_pdf2img(pdf_file)
+    crops = []
+    for region in scale_regions(REGIONS):
+        crop = image.crop(get_crop_box(region, image.size))
+        crop.putalpha(get_region_mask(crop.size, region["mask"], region["mask_box"]))
+        crops.append(crop)
+    return crops
+
+
+def run_functions(pdf_files, repeat):
+    """
+    Time each extraction function over the corpus
+    """
+    results = {}
+
+    results["convert_pdf_to_txt"] = time_each(convert_pdf_to_txt, pdf_files, repeat)
+
+    texts = [convert_pdf_to_str(pdf_file) for pdf_file in pdf_files]
+    results["get_text_from_pdf"] = time_each(get_text_from_pdf, texts, repeat)
+
+    results["extract_text_from_pdf"] = time_each(extract_text_from_pdf, pdf_files, repeat)
+
+    # Page scan run before per-page extraction of multi-report PDFs
+    results["find_report_pages"] = time_each(find_report_pages, pdf_files, repeat)
+
+    results["extract_grids_from_pdf"] = time_each(extract_grids_from_pdf, pdf_files, repeat)
+
+    results["convert_pdf2img"] = time_each(convert_pdf2img, pdf_files, repeat)
+
+    crops = get_untrimmed_crops(pdf_files[0])
+    results["trim_whitespace"] = time_each(trim_whitespace, crops, repeat)
+
+    results["extract_images_from_pdf.memory"] = time_each(
+        lambda pdf_file: extract_images_from_pdf(pdf_file, None), pdf_files, repeat)
+
+    # Thumbnail mode: a 1x render has a quarter of the default pixels
+    results["extract_images_from_pdf.memory_1x"] = time_each(
+        lambda pdf_file: extract_images_from_pdf(pdf_file, None, zoom=1), pdf_files, repeat)
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        results["extract_images_from_pdf.disk"] = time_each(
+            lambda pdf_file: extract_images_from_pdf(pdf_file, output_dir), pdf_files, repeat)
+
+    return results
+
+
+def time_import(repeat):
+    """
+    Time importing the app in a fresh interpreter, repeat times
+    """
+    env = dict(os.environ, JOBS_DB="")
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "import main"], cwd=APP_DIR, env=env,
+                       stdout=subprocess.DEVNULL, check=True)
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def get_free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(timeout=60):
+    """
+    Start the app under uvicorn on a free port and wait until it is
+    warmed up. Returns (process, base URL, seconds until ready).
+    """
+    port = get_free_port()
+    # Keep background jobs in memory so runs leave nothing behind
+    env = dict(os.environ, JOBS_DB="")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=APP_DIR, env=env, stdout=subprocess.DEVNULL
+    )
+    url = f"http://127.0.0.1:{port}"
+
+    start = time.perf_counter()
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("Benchmark server exited during startup")
+        try:
+            # 503 (an HTTPError, so an OSError) until warmed up
+            with urllib.request.urlopen(url + "/ready", timeout=1):
+                return process, url, time.perf_counter() - start
+        except OSError:
+            time.sleep(0.1)
+
+    process.terminate()
+    raise RuntimeError("Benchmark server did not start in time")
+
+
+def post_pdf(url, endpoint, pdf_file, options, upload):
+    """
+    POST one PDF to an API endpoint and return the response status
+    """
+    if upload:
+        with open(pdf_file, "rb") as f:
+            body = f.read()
+        query = "&".join(f"{key}={value}" for key, value in options.items())
+        request = urllib.request.Request(f"{url}/api/{endpoint}?{query}", data=body, method="POST",
+                                         headers={"Content-Type": "application/pdf"})
+    else:
+        body = json.dumps(dict(options, pdf_path=os.path.abspath(pdf_file))).encode("utf-8")
+        request = urllib.request.Request(f"{url}/api/{endpoint}", data=body, method="POST",
+                                         headers={"Content-Type": "application/json"})
+
+    with urllib.request.urlopen(request, timeout=300) as response:
+        response.read()
+        return response.status
+
+
+def run_http(url, pdf_files, requests, concurrency, upload=False):
+    """
+    Drive every HTTP_ENDPOINTS endpoint with concurrent clients.
+
+    Requests cycle through the corpus. The first len(pdf_files) of each
+    endpoint miss the result cache ("cold"); the rest are sent once those
+    are done, so they hit it ("warm").
+    """
+    results = {}
+
+    for endpoint, options in HTTP_ENDPOINTS.items():
+        def request(index):
+            start = time.perf_counter()
+            try:
+                ok = post_pdf(url, endpoint, pdf_files[index % len(pdf_files)], options, upload) == 200
+            except Exception:
+                ok = False
+            return index, ok, time.perf_counter() - start
+
+        cold_requests = min(requests, len(pdf_files))
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            samples = list(pool.map(request, range(cold_requests)))
+            samples += pool.map(request, range(cold_requests, requests))
+        elapsed = time.perf_counter() - start
+
+        cold = [duration for index, ok, duration in samples if ok and index < len(pdf_files)]
+        warm = [duration for index, ok, duration in samples if ok and index >= len(pdf_files)]
+        results[f"http.{endpoint}"] = {
+            "requests": requests,
+            "concurrency": concurrency,
+            "errors": sum(not ok for _, ok, _ in samples),
+            "requests_per_second": requests / elapsed,
+            "cold": summarize(cold) if cold else None,
+            "warm": summarize(warm) if warm else None,
+        }
+
+    return results
+
+
+def get_git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=APP_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def get_metadata(args):
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_commit": get_git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "pymupdf": fitz.VersionBind,
+        "pillow": PIL.__version__,
+        "arguments": vars(args),
+    }
+
+
+def get_median(result):
+    """
+    Median latency of a result entry, for comparisons
+    """
+    if "median_ms" in result:
+        return result["median_ms"]
+    for phase in ("cold", "warm"):
+        if result.get(phase):
+            return result[phase]["median_ms"]
+    return None
+
+
+def compare(results, baseline, threshold):
+    """
+    Print the median latency change of every benchmark present in both
+    runs. Returns the names of those slower than baseline by more than
+    threshold (a ratio, e.g. 0.1 for 10%).
+    """
+    regressions = []
+
+    for name, result in results["benchmarks"].items():
+        previous = baseline["benchmarks"].get(name)
+        if previous is None:
+            continue
+        new, old = get_median(result), get_median(previous)
+        if not new or not old:
+            continue
+
+        change = new / old - 1
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<36} {old:10.2f} ms -> {new:10.2f} ms  {change:+7.1%}{flag}")
+
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the PDF extraction paths")
+    parser.add_argument("--reports", type=int, default=20, help="synthetic reports in the corpus")
+    parser.add_argument("--pages", type=int, default=1, help="pages per report")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first report")
+    parser.add_argument("--repeat", type=int, default=3, help="passes over the corpus per function")
+    parser.add_argument("--http-requests", type=int, default=100, help="requests per endpoint (0 skips HTTP)")
+    parser.add_argument("--concurrency", type=int, default=4, help="concurrent HTTP clients")
+    parser.add_argument("--url", help="benchmark a running server instead of starting one")
+    parser.add_argument("--upload", action="store_true", help="send PDFs as request bodies instead of paths")
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON results file")
+    parser.add_argument("--compare", help="earlier JSON results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="slowdown ratio flagged as a regression")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        pdf_files = make_corpus(corpus_dir, args.reports, args.pages, args.seed)
+
+        benchmarks = run_functions(pdf_files, args.repeat)
+
+        benchmarks["startup.import"] = time_import(args.repeat)
+
+        if args.http_requests > 0:
+            process = None
+            url = args.url
+            if url is None:
+                process, url, ready_seconds = start_server()
+                benchmarks["startup.ready"] = summarize([ready_seconds])
+            try:
+                benchmarks.update(run_http(url, pdf_files, args.http_requests, args.concurrency, args.upload))
+            finally:
+                if process is not None:
+                    process.terminate()
+                    process.wait()
+
+    results = {"meta": get_metadata(args), "benchmarks": benchmarks}
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"Regressions: {', '.join(regressions)}")
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,42 @@
+import time
+
+# Time the imports below, reported by /ready and /metrics
+import_start = time.perf_counter()
+
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from routes.pdf_routes import router as pdf_router
+from fastapi.responses import JSONResponse, PlainTextResponse
+from routes.pdf_routes import limiters, router as pdf_router
+from utils.executor import executor
+from utils.static_store import static_store
+from utils.jobs import job_queue
+from utils.metrics import MetricsMiddleware, register_gauge, render_metrics
+from utils.result_cache import result_cache
+from utils.warmup import readiness
 from fastapi.staticfiles import StaticFiles
 import os
 
+readiness.import_seconds = time.perf_counter() - import_start
+
+@asynccontextmanager
+async def lifespan(app):
+    # Warm up PyMuPDF and the PDF workers; /ready answers once done
+    readiness.start()
+    # Keep the static image store and the result cache files within their limits
+    static_store.start_sweeper()
+    result_cache.start_sweeper()
+    # Run background extraction jobs, including those left by a previous run
+    job_queue.start()
+    yield
+    # Stop the jobs, the PDF worker processes and the sweeper with the server
+    job_queue.stop()
+    executor.shutdown()
+    static_store.stop_sweeper()
+    result_cache.stop_sweeper()
+
 # Create FastAPI app
-app = FastAPI(title="PDF Processing API")
+app = FastAPI(title="PDF Processing API", lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -16,6 +47,34 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Time every request and count requests in flight
+app.add_middleware(MetricsMiddleware)
+
+# Load of the PDF worker pool and the background job queue
+register_gauge("pdf_executor_pending", "PDF tasks running or waiting for a worker", lambda: executor.pending)
+register_gauge("pdf_executor_capacity", "PDF tasks accepted before requests get 503", lambda: executor.workers + executor.queue_depth)
+register_gauge("pdf_jobs_queued", "Background jobs waiting to run", job_queue.depth)
+register_gauge("result_cache_hits_total", "Extraction result cache hits", lambda: result_cache.hits, "counter")
+register_gauge("result_cache_misses_total", "Extraction result cache misses", lambda: result_cache.misses, "counter")
+register_gauge("result_cache_bytes", "Memory used by the extraction result cache", lambda: result_cache.size)
+
+# Size of the static image store as of its last sweep
+register_gauge("static_store_files", "Files in the static image store at the last sweep", lambda: static_store.files)
+register_gauge("static_store_bytes", "Bytes in the static image store at the last sweep", lambda: static_store.size)
+register_gauge("static_store_removed_total", "Files removed from the static image store by sweeps",
+               lambda: static_store.removed, "counter")
+
+# Requests running and waiting within each endpoint's concurrency limit
+register_gauge("http_endpoint_active_requests", "Requests running within the endpoint limit",
+               lambda: {(name,): limiter.active for name, limiter in limiters.items()}, label_names=("endpoint",))
+register_gauge("http_endpoint_waiting_requests", "Requests waiting for the endpoint limit",
+               lambda: {(name,): limiter.waiting for name, limiter in limiters.items()}, label_names=("endpoint",))
+
+# Startup cost and readiness of this server process
+register_gauge("app_import_seconds", "Time spent importing the application", lambda: readiness.import_seconds)
+register_gauge("app_warmup_seconds", "Time spent warming up PyMuPDF and the PDF workers", lambda: readiness.warmup_seconds or 0)
+register_gauge("app_ready", "1 once the server is warmed up", lambda: int(readiness.ready))
+
 # Define the static files directory
 static_dir = "/app/static"
 
@@ -27,12 +86,24 @@ app.mount("/static", StaticFiles(directory=static_dir), name="static")
 
 # Root endpoint
 @app.get("/")
-def read_root():
+async def read_root():
     return {"message": "Hello from Python FastAPI!"}
 
+# Prometheus metrics of this server process
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+# Readiness probe: 503 until the warm-up is done, so replicas get traffic
+# only once their first request runs at steady-state latency
+@app.get("/ready")
+async def ready():
+    return JSONResponse(readiness.stats(), status_code=200 if readiness.ready else 503)
+
 # Register routers
 app.include_router(pdf_router, prefix="/api", tags=["PDF Operations"])
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("main:app", host="0.0.0.0", port=5000, reload=True) 
\ No newline at end of file
+    # Reloading watches the source tree; only for development (RELOAD=1)
+    uvicorn.run("main:app", host="0.0.0.0", port=5000, reload=os.environ.get("RELOAD", "0") == "1") 
\ No newline at end of file
@@ -1,11 +1,25 @@
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import JSONResponse
-from pdf2image import convert_from_path
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+import base64
+import io
 import os
+import re
+import json
 import time
-from pydantic import BaseModel
-from utils.text_extractor import get_text_from_pdf, convert_pdf_to_txt
-from utils.image_extractor import extract_images_from_pdf
+from functools import partial
+from typing import Any, Dict, List, Literal, Optional
+from pydantic import BaseModel, Field, ValidationError
+from utils.text_extractor import extract_text_from_pdf, find_report_pages, CRITICAL_FIELDS, TEXT_EXTRACTOR_VERSION
+from utils.image_extractor import extract_images_from_pdf, convert_pdf_pages, get_page_count, new_image_name, DEFAULT_ENCODER, IMAGE_EXTRACTOR_VERSION, ZOOM
+from utils.executor import executor, is_cancelled, iter_completed, QueueFullError, run_when_free, TaskCancelledError
+from utils.result_cache import result_cache, source_digest, make_key
+from utils.document import analyze_pdf
+from utils.grid_extractor import extract_grids_from_pdf, pack_grid, GRID_EXTRACTOR_VERSION
+from utils.static_store import static_store
+from utils.jobs import job_queue
+from utils.limits import EndpointLimiter, RequestAborted, RequestTimeoutError
 from fastapi.staticfiles import StaticFiles
 
 router = APIRouter()
@@ -13,121 +27,322 @@ router = APIRouter()
 class PdfRequest(BaseModel):
     pdf_path: str
 
-@router.post("/convert-pdf")
-def convert_pdf(request: PdfRequest):
+class PagesRequest(PdfRequest):
+    # Pages to extract one report each from (1-based, inclusive; last_page
+    # None reads to the end); with either set the results are grouped per
+    # page. Otherwise text is merged from every page read (see max_pages)
+    # and images come from the first page
+    first_page: Optional[int] = Field(None, ge=1)
+    last_page: Optional[int] = Field(None, ge=1)
+
+class TextRequest(PagesRequest):
+    # Read at most this many pages
+    max_pages: Optional[int] = Field(None, ge=1)
+    # Stop reading pages once the critical fields are found
+    early_exit: bool = False
+
+class ImagesRequest(PagesRequest):
+    # Encoding of the region images
+    format: Literal["png", "webp", "jpeg"] = DEFAULT_ENCODER["format"]
+    compress_level: int = Field(DEFAULT_ENCODER["compress_level"], ge=0, le=9)
+    quality: int = Field(DEFAULT_ENCODER["quality"], ge=1, le=100)
+    # Quantize PNGs to a palette of this many colors
+    colors: Optional[int] = Field(DEFAULT_ENCODER["colors"], ge=2, le=256)
+    # Render scale in pixels per PDF point; 1 is a fast thumbnail mode
+    # rendering a quarter of the default pixels, up to 4 for print quality
+    scale: float = Field(ZOOM, ge=0.5, le=4)
+    # "url" writes files under /static, "base64" inlines them in the JSON
+    # response and "zip" returns a ZIP archive; the last two never touch disk
+    delivery: Literal["url", "base64", "zip"] = "url"
+
+class GridsRequest(PdfRequest):
+    # "json" lists the values, "binary" returns the packed arrays
+    delivery: Literal["json", "binary"] = "json"
+    # Array type of the binary delivery (see GRID_DTYPES)
+    dtype: Literal["float32", "int8"] = "float32"
+
+class ConvertPdfRequest(PdfRequest):
+    dpi: int = Field(200, ge=36, le=600)
+    first_page: int = Field(1, ge=1)
+    # None converts every page from first_page to the end
+    last_page: Optional[int] = Field(1, ge=1)
+    format: Literal["jpeg", "png", "webp"] = "jpeg"
+    # Stream one NDJSON record per page as soon as it is rendered
+    stream: bool = False
+
+class BatchRequest(BaseModel):
+    pdf_paths: List[str] = []
+    # Directory whose *.pdf files are added after pdf_paths
+    directory: Optional[str] = None
+    extract: Literal["text", "images", "analyze", "grids"] = "text"
+    # Text extraction options, as for /extract-text
+    max_pages: Optional[int] = Field(None, ge=1)
+    early_exit: bool = False
+    # Page range of text and images extraction, as for /extract-text
+    first_page: Optional[int] = Field(None, ge=1)
+    last_page: Optional[int] = Field(None, ge=1)
+    # Stream one NDJSON record per file as soon as it is done
+    stream: bool = False
+
+class JobRequest(PdfRequest):
+    extract: Literal["text", "images", "analyze", "grids"] = "text"
+    # Options of the matching endpoint, e.g. max_pages or format
+    options: Dict[str, Any] = {}
+    # URL receiving a POST of the job once it is finished
+    callback_url: Optional[str] = None
+
+# Request model validating the options of each job kind
+JOB_REQUESTS = {
+    "text": TextRequest,
+    "images": ImagesRequest,
+    "analyze": PdfRequest,
+    "grids": GridsRequest,
+}
+
+# Largest number of files accepted by one /batch request
+BATCH_MAX_FILES = int(os.environ.get("BATCH_MAX_FILES", "1000"))
+
+# Largest PDF accepted as an upload or raw request body, in bytes
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_BYTES", str(100 * 1024 * 1024)))
+
+# Room for the other form fields and the part headers of a multipart
+# upload, in bytes, on top of MAX_UPLOAD_BYTES
+MULTIPART_OVERHEAD = 1024 * 1024
+
+# Content types of a raw PDF request body
+PDF_CONTENT_TYPES = ("application/pdf", "application/octet-stream")
+
+# Concurrency limit and timeout of each endpoint's blocking work, so slow
+# extractions on one endpoint cannot take the threads of the others (see
+# utils.limits); batches are not timed out unless REQUEST_TIMEOUT_BATCH is set
+limiters = {
+    name: EndpointLimiter(name)
+    for name in ("convert_pdf", "extract_text", "extract_images", "analyze", "extract_grids")
+}
+limiters["batch"] = EndpointLimiter("batch", timeout=0)
+
+def server_busy():
     """
-    Endpoint to convert PDF to image
+    503 response returned when the PDF worker queue is full
     """
-    try:
-        pdf_path = request.pdf_path
+    return HTTPException(
+        status_code=503,
+        detail="Server is busy processing other PDFs, please retry later",
+        headers={"Retry-After": "1"},
+    )
+
+def resolve_pdf_path(pdf_path):
+    """
+    Resolve a requested PDF path inside the container, raising 404 when the
+    file does not exist
+    """
+    # Handle relative paths correctly inside the container
+    # If the path doesn't start with /, assume it's relative to /app
+    if not pdf_path.startswith('/'):
+        actual_path = os.path.join('/app', pdf_path)
+    else:
+        actual_path = pdf_path
+    
+    print(f"Looking for PDF at: {actual_path}")
+    
+    # Check if the file exists
+    if not os.path.exists(actual_path):
+        raise HTTPException(status_code=404, detail=f"PDF file not found: {pdf_path} (resolved to {actual_path})")
+    
+    return actual_path
+
+class PageRangeError(HTTPException):
+    """
+    400 response for a page range selecting no page of the PDF
+    """
+    
+    def __init__(self, detail):
+        super().__init__(status_code=400, detail=detail)
+
+def check_page_range(first_page, last_page, page_count=None):
+    """
+    Raise PageRangeError unless pages first_page to last_page (1-based,
+    inclusive; None for the first and last page) select at least one page
+    of a PDF of page_count pages. page_count None only checks the order.
+    """
+    first_page = first_page or 1
+    if last_page is not None and last_page < first_page:
+        raise PageRangeError("last_page must not be before first_page")
+    if page_count is not None and first_page > page_count:
+        raise PageRangeError(f"first_page {first_page} is beyond the last page of the PDF ({page_count} pages)")
+
+def upload_too_large():
+    """
+    413 response returned when an uploaded PDF exceeds MAX_UPLOAD_BYTES
+    """
+    return HTTPException(status_code=413, detail=f"PDF is larger than {MAX_UPLOAD_BYTES} bytes")
+
+async def read_body(request):
+    """
+    Read a raw request body, stopping as soon as it exceeds MAX_UPLOAD_BYTES
+    """
+    if int(request.headers.get("content-length") or 0) > MAX_UPLOAD_BYTES:
+        raise upload_too_large()
+    
+    chunks = []
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > MAX_UPLOAD_BYTES:
+            raise upload_too_large()
+        chunks.append(chunk)
+    
+    return b"".join(chunks)
+
+async def read_form(request):
+    """
+    Parse a multipart/form-data body, stopping as soon as it exceeds
+    MAX_UPLOAD_BYTES (plus MULTIPART_OVERHEAD) instead of spooling it whole
+    """
+    limit = MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD
+    if int(request.headers.get("content-length") or 0) > limit:
+        raise upload_too_large()
+    
+    receive = request.receive
+    size = 0
+    
+    async def limited_receive():
+        nonlocal size
+        message = await receive()
+        if message["type"] == "http.request":
+            size += len(message.get("body", b""))
+            if size > limit:
+                raise upload_too_large()
+        return message
+    
+    return await Request(request.scope, limited_receive).form()
+
+async def read_upload(upload):
+    """
+    Read a multipart file upload, up to MAX_UPLOAD_BYTES
+    """
+    data = await upload.read(MAX_UPLOAD_BYTES + 1)
+    if len(data) > MAX_UPLOAD_BYTES:
+        raise upload_too_large()
+    return data
+
+def pdf_input(model):
+    """
+    Dependency reading a request for model from a JSON body naming the PDF
+    by pdf_path, a multipart/form-data upload with the PDF in its "file"
+    field, or a raw application/pdf body.
+    
+    Uploaded PDFs stay in memory, so the services need not share a volume.
+    Options of uploads come from the other form fields or the query string.
+    Returns (options, data), data being the PDF bytes or None for pdf_path.
+    """
+    async def read_pdf_input(request: Request):
+        content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+        options = dict(request.query_params)
+        data = None
         
-        # Handle relative paths correctly inside the container
-        # If the path doesn't start with /, assume it's relative to /app
-        if not pdf_path.startswith('/'):
-            actual_path = os.path.join('/app', pdf_path)
+        if content_type == "multipart/form-data":
+            form = await read_form(request)
+            upload = form.get("file")
+            if upload is None or isinstance(upload, str):
+                raise HTTPException(status_code=400, detail='Missing PDF upload in the "file" form field')
+            options.update((key, value) for key, value in form.items() if key != "file")
+            options.setdefault("pdf_path", upload.filename or "upload.pdf")
+            data = await read_upload(upload)
+        elif content_type in PDF_CONTENT_TYPES:
+            options.setdefault("pdf_path", "upload.pdf")
+            data = await read_body(request)
         else:
-            actual_path = pdf_path
-        
-        print(f"Looking for PDF at: {actual_path}")
-        
-        # Check if the file exists
-        if not os.path.exists(actual_path):
-            raise HTTPException(status_code=404, detail=f"PDF file not found: {pdf_path} (resolved to {actual_path})")
+            try:
+                options = await request.json()
+            except ValueError:
+                raise HTTPException(status_code=422, detail="Request body is not valid JSON")
         
-        # Create output directory if it doesn't exist
-        output_dir = os.path.join(os.path.dirname(actual_path), "converted_images")
-        os.makedirs(output_dir, exist_ok=True)
+        if data is not None and not data:
+            raise HTTPException(status_code=400, detail="Empty PDF upload")
         
-        # Generate a unique filename using timestamp
-        timestamp = int(time.time())
-        output_image_path = os.path.join(output_dir, f"converted_{timestamp}.jpg")
-        
-        # Convert PDF to image (first page only)
-        images = convert_from_path(actual_path, first_page=1, last_page=1)
-        
-        # Save the image
-        if images:
-            images[0].save(output_image_path, 'JPEG')
-            return {"image_path": output_image_path}
-        else:
-            raise HTTPException(status_code=500, detail="Failed to convert PDF to image")
+        try:
+            return model.model_validate(options), data
+        except ValidationError as e:
+            raise RequestValidationError(e.errors(include_url=False))
+    
+    return read_pdf_input
+
+def pdf_request_body(model):
+    """
+    OpenAPI request body of an endpoint reading its input with pdf_input
+    """
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": model.model_json_schema()},
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "properties": {"file": {"type": "string", "format": "binary"}},
+                        "required": ["file"]
+                    }
+                },
+                "application/pdf": {"schema": {"type": "string", "format": "binary"}}
+            }
+        }
+    }
+
+def get_pdf_source(request, data):
+    """
+    The uploaded PDF bytes, or the resolved path of request.pdf_path
+    """
+    if data is not None:
+        return data
+    return resolve_pdf_path(request.pdf_path)
+
+def get_pdf_label(source):
+    """
+    pdf_path reported in responses: the resolved path, or None for uploads
+    """
+    return source if isinstance(source, str) else None
+
+@router.post("/convert-pdf")
+async def convert_pdf(request: ConvertPdfRequest, http_request: Request):
+    """
+    Endpoint to convert PDF pages to images
     
+    Pages are rendered in-process with PyMuPDF at the requested DPI, page
+    range and format.
+    """
+    try:
+        return await limiters["convert_pdf"].run(http_request, get_convert_response, request)
+    
+    except QueueFullError:
+        raise server_busy()
+    except HTTPException:
+        # Missing PDF, bad page range, timeout or disconnect: keep the status
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing PDF: {str(e)}")
 
 
-@router.post("/extract-text")
-def extract_text(request: PdfRequest):
+@router.post("/extract-text", openapi_extra=pdf_request_body(TextRequest))
+async def extract_text(http_request: Request, pdf=Depends(pdf_input(TextRequest))):
     """
     Endpoint to extract text and patient details from PDF
     
     This endpoint extracts both structured patient data and raw text from a PDF file.
+    max_pages bounds the pages read and early_exit stops at the first page
+    by which the critical fields are found. With first_page or last_page
+    set every report page in that range is parsed on its own, in parallel,
+    and the details are returned per page. The PDF is named by pdf_path or
+    uploaded (see pdf_input).
     """
+    request, data = pdf
     try:
-        pdf_path = request.pdf_path
-        
-        # Handle relative paths correctly inside the container
-        if not pdf_path.startswith('/'):
-            actual_path = os.path.join('/app', pdf_path)
-        else:
-            actual_path = pdf_path
-        
-        print(f"Looking for PDF at: {actual_path}")
-        
-        # Check if the file exists
-        if not os.path.exists(actual_path):
-            raise HTTPException(status_code=404, detail=f"PDF file not found: {pdf_path} (resolved to {actual_path})")
-        
-        # First convert PDF to text
-        text_content = convert_pdf_to_txt(actual_path)
-        
-        # Then extract structured data from the text content
-        result = get_text_from_pdf(text_content)
-        
-        # Parse the result to get the JSON data
-        # The result is in format "[(status)]{json_data}"
-        import json
-        import re
-        
-        # Extract status and JSON data
-        match = re.match(r'\[\((\d)\)\](.*)', result)
-        if match:
-            status = match.group(1)
-            json_str = match.group(2)
-            
-            # Parse the JSON string into a Python dict
-            parsed_data = json.loads(json_str)
-            
-            # Check which critical fields are missing
-            missing_fields = []
-            critical_fields = ["Patient", "Patient ID", "Date of Birth", "Test Type"]
-            for field in critical_fields:
-                if not parsed_data.get(field):
-                    missing_fields.append(field)
-            
-            # Format the response as requested
-            if status == "1":
-                message = "PDF text extraction successful"
-            else:
-                if missing_fields:
-                    message = f"PDF text extraction partially successful. Missing critical fields: {', '.join(missing_fields)}"
-                else:
-                    message = "PDF text extraction partially successful, some data may be missing"
-            
-            return {
-                "data": {
-                    "text": parsed_data
-                },
-                "message": message
-            }
-        else:
-            return {
-                "data": {
-                    "text": {}
-                },
-                "message": "Error parsing PDF extraction result"
-            }
+        return await limiters["extract_text"].run(http_request, get_extract_text_response, request, data)
     
+    except QueueFullError:
+        raise server_busy()
+    except (RequestAborted, PageRangeError):
+        raise
     except Exception as e:
         return {
             "data": {
@@ -136,67 +351,950 @@ def extract_text(request: PdfRequest):
             "message": f"Error extracting text from PDF: {str(e)}"
         }
 
-@router.post("/extract-images")
-def extract_images(request: PdfRequest):
+@router.post("/extract-images", openapi_extra=pdf_request_body(ImagesRequest))
+async def extract_images(http_request: Request, pdf=Depends(pdf_input(ImagesRequest))):
     """
     Endpoint to extract visualization images from PDF files
     
     This endpoint extracts various visualization images from a PDF file,
     saves them to the local filesystem, and returns URLs to access them.
+    The output format, PNG compression level, WebP/JPEG quality and PNG
+    palette size can be chosen per request. With first_page or last_page
+    set the images of every report page in that range are extracted in
+    parallel and returned per page. The PDF is named by pdf_path or
+    uploaded (see pdf_input).
     """
+    request, data = pdf
     try:
-        pdf_path = request.pdf_path
-        
-        # Handle relative paths correctly inside the container
-        if not pdf_path.startswith('/'):
-            actual_path = os.path.join('/app', pdf_path)
-        else:
-            actual_path = pdf_path
-        
-        print(f"Looking for PDF at: {actual_path}")
-        
-        # Check if the file exists
-        if not os.path.exists(actual_path):
-            raise HTTPException(status_code=404, detail=f"PDF file not found: {pdf_path} (resolved to {actual_path})")
-        
-        # Create a unique directory for this extraction within the static folder
+        return await limiters["extract_images"].run(http_request, get_extract_images_response, request, data)
+    
+    except QueueFullError:
+        raise server_busy()
+    except (RequestAborted, PageRangeError):
+        raise
+    except Exception as e:
+        return {
+            "data": {
+                "images": []
+            },
+            "message": f"Error extracting images from PDF: {str(e)}"
+        }
+
+@router.post("/analyze", openapi_extra=pdf_request_body(PdfRequest))
+async def analyze(http_request: Request, pdf=Depends(pdf_input(PdfRequest))):
+    """
+    Endpoint to extract patient details, visualization images and a page
+    preview from a PDF in one call
+    
+    The PDF is opened, parsed and rendered once for all three outputs, instead
+    of once per /extract-text, /extract-images and /convert-pdf call. The
+    PDF is named by pdf_path or uploaded (see pdf_input).
+    """
+    request, data = pdf
+    try:
+        return await limiters["analyze"].run(
+            http_request, lambda: get_analysis_response(get_pdf_source(request, data))
+        )
+    
+    except QueueFullError:
+        raise server_busy()
+    except RequestAborted:
+        raise
+    except Exception as e:
+        return {
+            "data": {
+                "text": {},
+                "images": [],
+                "preview": None
+            },
+            "message": f"Error analyzing PDF: {str(e)}"
+        }
+
+@router.post("/extract-grids", openapi_extra=pdf_request_body(GridsRequest))
+async def extract_grids(http_request: Request, pdf=Depends(pdf_input(GridsRequest))):
+    """
+    Endpoint to read the numeric sensitivity and deviation grids of a report
+    
+    The values printed on the sensitivity, total deviation and pattern
+    deviation plots are read from the PDF text layer, so no image is
+    rendered or transferred. delivery "binary" returns them as packed
+    arrays of dtype instead of JSON lists. The PDF is named by pdf_path or
+    uploaded (see pdf_input).
+    """
+    request, data = pdf
+    try:
+        return await limiters["extract_grids"].run(http_request, get_extract_grids_response, request, data)
+    
+    except QueueFullError:
+        raise server_busy()
+    except RequestAborted:
+        raise
+    except Exception as e:
+        return {
+            "data": {
+                "grids": {}
+            },
+            "message": f"Error extracting grids from PDF: {str(e)}"
+        }
+
+@router.post("/batch")
+async def batch(request: BatchRequest, http_request: Request):
+    """
+    Endpoint to run one extraction over many PDFs
+    
+    Files are fanned out over the PDF worker pool, keeping every worker busy,
+    and results are returned in request order with a report of the files
+    that failed. A batch whose client disconnects stops starting new files.
+    """
+    return await limiters["batch"].run(http_request, get_batch_response, request)
+
+@router.post("/jobs", status_code=202)
+async def create_job(request: JobRequest):
+    """
+    Endpoint to queue a text, images, analyze or grids extraction in the background
+    
+    Returns the job right away; poll GET /jobs/{id} for its status and
+    result, or pass callback_url to have the finished job POSTed to it.
+    """
+    # Check the options now rather than failing later in the background
+    try:
+        params = JOB_REQUESTS[request.extract].model_validate(dict(request.options, pdf_path=request.pdf_path))
+    except ValidationError as e:
+        raise RequestValidationError(e.errors(include_url=False))
+    
+    if request.callback_url and not request.callback_url.startswith(("http://", "https://")):
+        raise HTTPException(status_code=422, detail="callback_url must be an http(s) URL")
+    if getattr(params, "delivery", None) == "zip":
+        raise HTTPException(status_code=422, detail="ZIP delivery is not available for jobs")
+    if getattr(params, "delivery", None) == "binary":
+        raise HTTPException(status_code=422, detail="Binary delivery is not available for jobs")
+    
+    job = await run_in_threadpool(job_queue.submit, request.extract, params.model_dump(), request.callback_url)
+    
+    return {
+        "data": get_job_status(job),
+        "message": "Job queued"
+    }
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Endpoint reporting the status of a job, with its result once finished
+    """
+    job = await run_in_threadpool(job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    
+    return {
+        "data": get_job_status(job),
+        "message": f"Job {job['status']}"
+    }
+
+@router.get("/cache-stats")
+async def cache_stats():
+    """
+    Endpoint reporting result cache hit and miss counts
+    """
+    return result_cache.stats()
+
+def get_convert_response(request):
+    """
+    Render the pages of a /convert-pdf request into the response body, or
+    the NDJSON stream of its pages
+    """
+    actual_path = resolve_pdf_path(request.pdf_path)
+    
+    # Images are written next to the PDF
+    output_dir = os.path.join(os.path.dirname(actual_path), "converted_images")
+    
+    check_page_range(request.first_page, request.last_page)
+    page_count = executor.run(get_page_count, actual_path)
+    check_page_range(request.first_page, request.last_page, page_count)
+    
+    if request.stream:
+        return ndjson_response(stream_convert_pages(request, actual_path, output_dir, page_count),
+                               limiters["convert_pdf"])
+    
+    # Convert PDF pages to images on the worker pool
+    image_paths = executor.run(
+        convert_pdf_pages, actual_path, output_dir,
+        dpi=request.dpi,
+        first_page=request.first_page,
+        last_page=request.last_page,
+        image_format=request.format
+    )
+    
+    if image_paths:
+        return {"image_path": image_paths[0], "image_paths": image_paths}
+    else:
+        raise HTTPException(status_code=500, detail="Failed to convert PDF to image")
+
+def get_extract_text_response(request, data):
+    """
+    /extract-text response merged from every page read (up to max_pages),
+    or per page of a page range
+    """
+    source = get_pdf_source(request, data)
+    
+    if has_page_range(request):
+        return get_pages_text_response(source, request.first_page, request.last_page)
+    
+    return get_text_response(source, request.max_pages, request.early_exit)
+
+def get_extract_images_response(request, data):
+    """
+    /extract-images response in the requested delivery, of the first page
+    or of a page range
+    """
+    source = get_pdf_source(request, data)
+    
+    encoder = get_encoder(request)
+    
+    if has_page_range(request):
+        return get_pages_images_response(source, encoder, request.scale, request.delivery,
+                                         request.first_page, request.last_page, request.pdf_path)
+    
+    if request.delivery == "base64":
+        return get_inline_images_response(source, encoder, request.scale)
+    if request.delivery == "zip":
+        return get_images_zip_response(source, encoder, request.pdf_path, request.scale)
+    
+    return get_images_response(source, encoder, request.scale)
+
+def get_extract_grids_response(request, data):
+    """
+    /extract-grids response in the requested delivery
+    """
+    source = get_pdf_source(request, data)
+    
+    if request.delivery == "binary":
+        return get_grids_binary_response(source, request.dtype)
+    
+    return get_grids_response(source)
+
+def get_text_response(source, max_pages=None, early_exit=False, page_number=None, digest=None):
+    """
+    Extract patient details from a resolved PDF path (or the PDF bytes)
+    into the /extract-text response body; only from page page_number when
+    it is set, otherwise merged from every page read. digest is the
+    source_digest of source, when already known.
+    """
+    # Reuse the result of an earlier extraction of the same PDF and options
+    version = f"{TEXT_EXTRACTOR_VERSION}.{max_pages or 'all'}.{'early' if early_exit else 'full'}"
+    if page_number is not None:
+        version = f"{TEXT_EXTRACTOR_VERSION}.page{page_number}"
+    cache_key = make_key(digest or source_digest(source), "text", version)
+    result = result_cache.get(cache_key)
+    
+    if result is None:
+        # Convert PDF to text and extract structured data on the worker pool
+        result = executor.run(extract_text_from_pdf, source, max_pages, early_exit, page_number)
+        result_cache.set(cache_key, result)
+    
+    parsed_data, message = parse_text_result(result)
+    
+    return {
+        "data": {
+            "text": parsed_data
+        },
+        "message": message
+    }
+
+def get_images_version(encoder, scale, page_number=1):
+    """
+    Cache version of images extracted with encoder at render scale from
+    page page_number
+    """
+    version = ".".join([IMAGE_EXTRACTOR_VERSION, str(float(scale))] + [str(encoder[key]) for key in sorted(encoder)])
+    if page_number != 1:
+        version += f".page{page_number}"
+    return version
+
+def get_images_response(source, encoder=DEFAULT_ENCODER, scale=ZOOM, page_number=1, digest=None):
+    """
+    Extract visualization images from page page_number of a resolved PDF
+    path (or the PDF bytes) at render scale into the /extract-images
+    response body; digest as for get_text_response
+    """
+    # Reuse the images of an earlier extraction of the same PDF and encoding
+    version = get_images_version(encoder, scale, page_number)
+    cache_key = make_key(digest or source_digest(source), "images", version)
+    cached = result_cache.get(cache_key)
+    
+    if cached is not None and stored_files_exist(cached["result"]["images"]):
+        timestamp = cached["extraction_time"]
+        result = cached["result"]
+    else:
         timestamp = int(time.time())
-        extraction_dir = f"extracted_images_{timestamp}"
-        output_dir = os.path.join('/app/static', extraction_dir)
         
-        # Extract images from the PDF
-        result = extract_images_from_pdf(actual_path, output_dir)
+        # Extract images from the PDF in memory on the worker pool and keep
+        # them in the content-addressed static store
+        result = executor.run(extract_images_from_pdf, source, None, encoder=encoder, zoom=scale,
+                              page_number=page_number)
+        store_files(result["images"])
         
-        # Generate URLs for each image
-        base_url = f"/static/{extraction_dir}"
-        images_with_urls = []
+        if result["status"]:
+            result_cache.set(cache_key, {
+                "extraction_time": timestamp,
+                "result": result
+            })
+    
+    images_with_urls = get_image_urls(result)
+    
+    return {
+        "data": {
+            "images": images_with_urls,
+            "pdf_path": get_pdf_label(source),
+            "extraction_time": timestamp
+        },
+        "message": "Images successfully extracted" if result["status"] else "Some images could not be extracted"
+    }
+
+def get_inline_images(source, encoder=DEFAULT_ENCODER, scale=ZOOM, page_number=1, digest=None):
+    """
+    Extract visualization images from page page_number of a resolved PDF
+    path (or the PDF bytes) at render scale in memory; digest as for
+    get_text_response.
+    
+    Returns the extraction information with each image's bytes base64
+    encoded under "data".
+    """
+    # Reuse the images of an earlier extraction of the same PDF and encoding
+    version = get_images_version(encoder, scale, page_number)
+    cache_key = make_key(digest or source_digest(source), "images-inline", version)
+    result = result_cache.get(cache_key)
+    
+    if result is None:
+        # Extract images from the PDF on the worker pool, without writing files
+        result = executor.run(extract_images_from_pdf, source, None, encoder=encoder, zoom=scale,
+                              page_number=page_number)
         
         for image in result["images"]:
             if image["success"]:
-                image_url = f"{base_url}/{image['filename']}"
-                images_with_urls.append({
+                image["data"] = base64.b64encode(image["data"]).decode("ascii")
+        
+        if result["status"]:
+            result_cache.set(cache_key, result)
+    
+    return result
+
+def get_inline_images_response(source, encoder=DEFAULT_ENCODER, scale=ZOOM, page_number=1, digest=None):
+    """
+    /extract-images response body with the images inlined as base64
+    """
+    result = get_inline_images(source, encoder, scale, page_number, digest)
+    images = get_inline_image_entries(result, encoder)
+    
+    return {
+        "data": {
+            "images": images,
+            "pdf_path": get_pdf_label(source)
+        },
+        "message": "Images successfully extracted" if result["status"] else "Some images could not be extracted"
+    }
+
+def get_inline_image_entries(result, encoder=DEFAULT_ENCODER):
+    """
+    Response entries of the successfully extracted images of a
+    get_inline_images result
+    """
+    content_type = f"image/{encoder['format']}"
+    
+    images = []
+    for image in result["images"]:
+        if image["success"]:
+            images.append({
+                "type": image["type"],
+                "filename": image["filename"],
+                "description": get_image_description(image["type"]),
+                "content_type": content_type,
+                "data": image["data"]
+            })
+    
+    return images
+
+def get_images_zip_response(source, encoder=DEFAULT_ENCODER, pdf_path=None, scale=ZOOM, page_results=None):
+    """
+    ZIP archive of the extracted images plus a manifest.json describing
+    them, named after pdf_path
+    
+    page_results maps page numbers to their get_inline_images results;
+    their images are stored under page<n>/ in the archive. Without it the
+    images of the first page are extracted and stored at the top.
+    """
+    # Imported here: ZIP delivery is rarely used
+    import zipfile
+    
+    if page_results is None:
+        result = get_inline_images(source, encoder, scale)
+        page_results = {None: result}
+    else:
+        result = {"status": all(page_result["status"] for page_result in page_results.values())}
+    
+    manifest = []
+    buffer = io.BytesIO()
+    # The images are already compressed, so store them as they are
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as archive:
+        for page_number, page_result in page_results.items():
+            for image in page_result["images"]:
+                if not image["success"]:
+                    continue
+                filename = image["filename"] if page_number is None else f"page{page_number}/{image['filename']}"
+                archive.writestr(filename, base64.b64decode(image["data"]))
+                entry = {
                     "type": image["type"],
-                    "url": image_url,
-                    "filename": image["filename"],
+                    "filename": filename,
                     "description": get_image_description(image["type"])
-                })
+                }
+                if page_number is not None:
+                    entry["page"] = page_number
+                manifest.append(entry)
+        archive.writestr("manifest.json", json.dumps({
+            "images": manifest,
+            "pdf_path": get_pdf_label(source),
+            "status": result["status"]
+        }))
+    
+    pdf_name = os.path.splitext(os.path.basename(pdf_path or get_pdf_label(source) or "images"))[0]
+    return Response(
+        content=buffer.getvalue(),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{pdf_name}_images.zip"'}
+    )
+
+def has_page_range(request):
+    """
+    Whether a request asks for a page range rather than the first page
+    """
+    return request.first_page is not None or request.last_page is not None
+
+def get_report_pages(source, first_page=None, last_page=None, digest=None):
+    """
+    (report page numbers, other page numbers) of a resolved PDF path (or
+    the PDF bytes) between first_page and last_page (see find_report_pages).
+    Raises PageRangeError when the range selects no page.
+    """
+    first_page = first_page or 1
+    check_page_range(first_page, last_page)
+    version = f"{TEXT_EXTRACTOR_VERSION}.{first_page}.{last_page or 'end'}"
+    cache_key = make_key(digest or source_digest(source), "report-pages", version)
+    result = result_cache.get(cache_key)
+    
+    if result is None:
+        result = executor.run(find_report_pages, source, first_page, last_page)
+        result_cache.set(cache_key, result)
+    
+    report_pages, other_pages = result
+    if not report_pages and not other_pages:
+        # Only a range starting past the end selects nothing; count the
+        # pages for the message
+        check_page_range(first_page, last_page, executor.run(get_page_count, source))
+    
+    return result
+
+def run_pages(get_page, page_numbers, parallel=True):
+    """
+    Run get_page(page_number) for every page, in parallel on the worker
+    pool unless parallel is False, and return one record per page in page
+    order: the page number, an error (None on success) and the fields
+    returned by get_page
+    """
+    def run_page(page_number):
+        record = {"page": page_number, "error": None}
+        try:
+            # A busy pool delays the page rather than failing it
+            record.update(run_when_free(get_page, page_number))
+        except HTTPException as e:
+            record["error"] = e.detail
+        except Exception as e:
+            record["error"] = str(e)
+        return record
+    
+    records = [None] * len(page_numbers)
+    for index, record in iter_completed(run_page, page_numbers, max(executor.workers, 1) if parallel else 1):
+        records[index] = record
+    
+    # Pages were skipped because the client is gone; nobody reads the result
+    if is_cancelled():
+        raise TaskCancelledError("Request was cancelled")
+    
+    return records
+
+def get_pages_message(kind, records, other_pages):
+    """
+    Message of a per-page response
+    """
+    failed = sum(record["error"] is not None for record in records)
+    message = f"{kind} extracted from {len(records) - failed} of {len(records)} report pages"
+    if other_pages:
+        message += f", {len(other_pages)} other pages skipped"
+    return message
+
+def get_pages_text_response(source, first_page=None, last_page=None, parallel=True):
+    """
+    /extract-text response body with the patient details of every report
+    page between first_page and last_page, each page parsed on its own
+    (see run_pages for parallel)
+    """
+    # Hash the PDF once for the cache keys of all its pages
+    digest = source_digest(source)
+    report_pages, other_pages = get_report_pages(source, first_page, last_page, digest)
+    
+    def get_page(page_number):
+        response = get_text_response(source, page_number=page_number, digest=digest)
+        return {"text": response["data"]["text"], "message": response["message"]}
+    
+    records = run_pages(get_page, report_pages, parallel)
+    
+    return {
+        "data": {
+            "pages": records,
+            "skipped_pages": other_pages,
+            "pdf_path": get_pdf_label(source)
+        },
+        "message": get_pages_message("Text", records, other_pages)
+    }
+
+def get_pages_images_response(source, encoder=DEFAULT_ENCODER, scale=ZOOM, delivery="url",
+                              first_page=None, last_page=None, pdf_path=None, parallel=True):
+    """
+    /extract-images response body (or ZIP archive) with the images of
+    every report page between first_page and last_page (see run_pages for
+    parallel)
+    """
+    # Hash the PDF once for the cache keys of all its pages
+    digest = source_digest(source)
+    report_pages, other_pages = get_report_pages(source, first_page, last_page, digest)
+    
+    if delivery == "zip":
+        page_results = dict(zip(report_pages, run_pages(
+            lambda page_number: get_inline_images(source, encoder, scale, page_number, digest),
+            report_pages, parallel)))
+        for page_number, record in list(page_results.items()):
+            if record["error"] is not None:
+                page_results[page_number] = {"images": [], "status": False}
+        return get_images_zip_response(source, encoder, pdf_path, scale, page_results)
+    
+    def get_page(page_number):
+        if delivery == "base64":
+            response = get_inline_images_response(source, encoder, scale, page_number, digest)
+        else:
+            response = get_images_response(source, encoder, scale, page_number, digest)
+        return {"images": response["data"]["images"], "message": response["message"]}
+    
+    records = run_pages(get_page, report_pages, parallel)
+    
+    return {
+        "data": {
+            "pages": records,
+            "skipped_pages": other_pages,
+            "pdf_path": get_pdf_label(source),
+            "extraction_time": int(time.time())
+        },
+        "message": get_pages_message("Images", records, other_pages)
+    }
+
+def get_analysis_response(source):
+    """
+    Analyze a resolved PDF path (or the PDF bytes) into the /analyze
+    response body
+    """
+    # Reuse the result of an earlier analysis of the same PDF
+    version = f"{TEXT_EXTRACTOR_VERSION}.{IMAGE_EXTRACTOR_VERSION}"
+    cache_key = make_key(source_digest(source), "analyze", version)
+    cached = result_cache.get(cache_key)
+    
+    if cached is not None and stored_files_exist(cached["result"]["images"]["images"] + [cached["result"]["preview"]]):
+        timestamp = cached["extraction_time"]
+        result = cached["result"]
+    else:
+        timestamp = int(time.time())
         
-        return {
-            "data": {
-                "images": images_with_urls,
-                "pdf_path": actual_path,
-                "extraction_time": timestamp
-            },
-            "message": "Images successfully extracted" if result["status"] else "Some images could not be extracted"
+        # Analyze the PDF in memory on the worker pool and keep the images
+        # in the content-addressed static store
+        result = executor.run(analyze_pdf, source, None)
+        store_files(result["images"]["images"] + [result["preview"]])
+        
+        if result["images"]["status"] and result["preview"]["success"]:
+            result_cache.set(cache_key, {
+                "extraction_time": timestamp,
+                "result": result
+            })
+    
+    parsed_data, text_message = parse_text_result(result["text"])
+    images_with_urls = get_image_urls(result["images"])
+    image_message = "Images successfully extracted" if result["images"]["status"] else "Some images could not be extracted"
+    
+    preview = None
+    if result["preview"]["success"]:
+        preview = {
+            "url": static_store.url(result["preview"]["name"]),
+            "filename": result["preview"]["filename"]
         }
     
-    except Exception as e:
-        return {
-            "data": {
-                "images": []
-            },
-            "message": f"Error extracting images from PDF: {str(e)}"
+    return {
+        "data": {
+            "text": parsed_data,
+            "images": images_with_urls,
+            "preview": preview,
+            "pdf_path": get_pdf_label(source),
+            "extraction_time": timestamp
+        },
+        "text_message": text_message,
+        "image_message": image_message,
+        "message": "PDF successfully analyzed"
+    }
+
+def get_grids(source):
+    """
+    Numeric grids of a resolved PDF path (or the PDF bytes), as returned by
+    extract_grids_from_pdf
+    """
+    # Reuse the grids of an earlier extraction of the same PDF
+    cache_key = make_key(source_digest(source), "grids", GRID_EXTRACTOR_VERSION)
+    result = result_cache.get(cache_key)
+    
+    if result is None:
+        # Read the grids from the PDF text layer on the worker pool
+        result = executor.run(extract_grids_from_pdf, source)
+        result_cache.set(cache_key, result)
+    
+    return result
+
+def get_grids_response(source):
+    """
+    Read the numeric grids of a resolved PDF path (or the PDF bytes) into
+    the /extract-grids response body
+    """
+    result = get_grids(source)
+    
+    return {
+        "data": {
+            "grids": result["grids"],
+            "pdf_path": get_pdf_label(source)
+        },
+        "message": "Grids successfully extracted" if result["status"] else "Some grids could not be extracted"
+    }
+
+def get_grids_binary_response(source, dtype="float32"):
+    """
+    The numeric grids packed as row-major little-endian arrays of dtype,
+    one after the other. The X-Grid-Shapes header lists each grid as
+    <type>=<rows>x<cols> in body order.
+    """
+    result = get_grids(source)
+    
+    shapes = ",".join(f"{grid_type}={grid['rows']}x{grid['cols']}" for grid_type, grid in result["grids"].items())
+    return Response(
+        content=b"".join(pack_grid(grid, dtype) for grid in result["grids"].values()),
+        media_type="application/octet-stream",
+        headers={
+            "X-Grid-Dtype": dtype,
+            "X-Grid-Shapes": shapes,
+            "X-Grid-Status": "1" if result["status"] else "0",
         }
+    )
+
+def get_encoder(request):
+    """
+    Image encoder settings (see DEFAULT_ENCODER) of an ImagesRequest
+    """
+    return {key: getattr(request, key) for key in DEFAULT_ENCODER}
+
+def run_text_job(params):
+    return get_extract_text_response(TextRequest.model_validate(params), None)
+
+def run_images_job(params):
+    # ZIP delivery is rejected when the job is created
+    return get_extract_images_response(ImagesRequest.model_validate(params), None)
+
+def run_analysis_job(params):
+    return get_analysis_response(resolve_pdf_path(params["pdf_path"]))
+
+def run_grids_job(params):
+    return get_grids_response(resolve_pdf_path(params["pdf_path"]))
+
+job_queue.register("text", run_text_job)
+job_queue.register("images", run_images_job)
+job_queue.register("analyze", run_analysis_job)
+job_queue.register("grids", run_grids_job)
+
+def get_job_status(job):
+    """
+    Public fields of a job
+    """
+    return {
+        "id": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "pdf_path": job["params"]["pdf_path"],
+        "result": job["result"],
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"]
+    }
+
+# Response builders used by /batch for each extract mode
+BATCH_EXTRACTORS = {
+    "text": get_text_response,
+    "images": get_images_response,
+    "analyze": get_analysis_response,
+    "grids": get_grids_response,
+}
+
+# Response builders used by /batch for a page range
+BATCH_PAGE_EXTRACTORS = {
+    "text": get_pages_text_response,
+    "images": get_pages_images_response,
+}
+
+def list_pdf_files(directory):
+    """
+    PDF files directly inside a directory (resolved like pdf_path), sorted
+    by name
+    """
+    if not directory.startswith('/'):
+        directory = os.path.join('/app', directory)
+    
+    if not os.path.isdir(directory):
+        raise HTTPException(status_code=404, detail=f"Directory not found: {directory}")
+    
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.lower().endswith('.pdf') and os.path.isfile(os.path.join(directory, name))
+    )
+
+def run_batch_item(get_response, pdf_path):
+    """
+    Run one /batch file, capturing its failure instead of raising
+    """
+    start = time.perf_counter()
+    item = {"pdf_path": pdf_path, "success": False, "result": None, "error": None}
+    
+    try:
+        # A busy pool delays the file rather than failing it
+        item["result"] = run_when_free(get_response, resolve_pdf_path(pdf_path))
+        item["success"] = True
+    except HTTPException as e:
+        item["error"] = e.detail
+    except Exception as e:
+        item["error"] = str(e)
+    
+    item["elapsed"] = time.perf_counter() - start
+    return item
+
+def iter_batch(get_response, pdf_paths):
+    """
+    Yield (index, item) for every /batch file as it finishes
+    """
+    # Threads only wait on the worker pool; keep about one file per worker in flight
+    return iter_completed(
+        lambda pdf_path: run_batch_item(get_response, pdf_path),
+        pdf_paths,
+        max(executor.workers, 1)
+    )
+
+def get_batch_response(request):
+    """
+    Run a /batch request into its response body, or the NDJSON stream of
+    its files
+    """
+    start = time.perf_counter()
+    
+    pdf_paths = list(request.pdf_paths)
+    if request.directory:
+        pdf_paths.extend(list_pdf_files(request.directory))
+    
+    if not pdf_paths:
+        raise HTTPException(status_code=400, detail="No PDF files given")
+    if len(pdf_paths) > BATCH_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"Too many PDF files: {len(pdf_paths)} (max {BATCH_MAX_FILES})")
+    
+    get_response = BATCH_EXTRACTORS[request.extract]
+    if request.extract == "text":
+        get_response = partial(get_text_response, max_pages=request.max_pages, early_exit=request.early_exit)
+    if has_page_range(request):
+        if request.extract not in BATCH_PAGE_EXTRACTORS:
+            raise HTTPException(status_code=400, detail="Page ranges only apply to text and images extraction")
+        check_page_range(request.first_page, request.last_page)
+        # Files already run in parallel; their pages run one at a time
+        get_response = partial(BATCH_PAGE_EXTRACTORS[request.extract],
+                               first_page=request.first_page, last_page=request.last_page, parallel=False)
+    
+    if request.stream:
+        return ndjson_response(stream_batch(get_response, pdf_paths, start), limiters["batch"])
+    
+    results = [None] * len(pdf_paths)
+    for index, item in iter_batch(get_response, pdf_paths):
+        results[index] = item
+    
+    # Files were skipped because the client is gone; nobody reads the result
+    if is_cancelled():
+        raise TaskCancelledError("Batch was cancelled")
+    
+    failures = [
+        {"index": index, "pdf_path": item["pdf_path"], "error": item["error"]}
+        for index, item in enumerate(results) if not item["success"]
+    ]
+    
+    return {
+        "data": {
+            "results": results,
+            "summary": {
+                "total": len(results),
+                "succeeded": len(results) - len(failures),
+                "failed": len(failures),
+                "failures": failures,
+                "elapsed": time.perf_counter() - start
+            }
+        },
+        "message": f"Batch processed: {len(results) - len(failures)} of {len(results)} files succeeded"
+    }
+
+def stream_batch(get_response, pdf_paths, start):
+    """
+    NDJSON records for a streamed /batch: one "file" record per file in
+    completion order, then a "summary" record
+    """
+    failures = []
+    
+    for index, item in iter_batch(get_response, pdf_paths):
+        if not item["success"]:
+            failures.append({"index": index, "pdf_path": item["pdf_path"], "error": item["error"]})
+        yield {"type": "file", "index": index, **item}
+    
+    yield {
+        "type": "summary",
+        "total": len(pdf_paths),
+        "succeeded": len(pdf_paths) - len(failures),
+        "failed": len(failures),
+        "failures": failures,
+        "elapsed": time.perf_counter() - start
+    }
+
+def stream_convert_pages(request, actual_path, output_dir, page_count):
+    """
+    NDJSON records for a streamed /convert-pdf of a PDF of page_count
+    pages: one "page" record per page in completion order, then a "summary"
+    record
+    """
+    start = time.perf_counter()
+    last_page = page_count if request.last_page is None else min(request.last_page, page_count)
+    pages = list(range(request.first_page, last_page + 1))
+    name = new_image_name()
+    
+    def convert_page(page_number):
+        record = {"type": "page", "page": page_number, "image_path": None, "error": None}
+        try:
+            # Each page is its own task so pages render in parallel
+            image_paths = run_when_free(
+                executor.run, convert_pdf_pages, actual_path, output_dir,
+                dpi=request.dpi,
+                first_page=page_number,
+                last_page=page_number,
+                image_format=request.format,
+                name=name
+            )
+            record["image_path"] = image_paths[0]
+        except Exception as e:
+            record["error"] = str(e)
+        return record
+    
+    image_paths = [None] * len(pages)
+    for index, record in iter_completed(convert_page, pages, max(executor.workers, 1)):
+        image_paths[index] = record["image_path"]
+        yield record
+    
+    yield {
+        "type": "summary",
+        "image_paths": image_paths,
+        "failed": image_paths.count(None),
+        "elapsed": time.perf_counter() - start
+    }
+
+def ndjson_response(records, limiter):
+    """
+    Stream an iterable of JSON-serializable records as NDJSON, produced
+    within the concurrency limit and timeout of limiter
+    """
+    async def iter_lines():
+        try:
+            async for record in limiter.stream(records):
+                yield json.dumps(record) + "\n"
+        except RequestTimeoutError as e:
+            # The status line is already sent; end with an error record
+            yield json.dumps({"type": "error", "error": e.detail}) + "\n"
+    
+    return StreamingResponse(iter_lines(), media_type="application/x-ndjson")
+
+def parse_text_result(result):
+    """
+    Parse a get_text_from_pdf result into (patient details, message)
+    """
+    # The result is in format "[(status)]{json_data}"
+    match = re.match(r'\[\((\d)\)\](.*)', result)
+    if not match:
+        return {}, "Error parsing PDF extraction result"
+    
+    status = match.group(1)
+    json_str = match.group(2)
+    
+    # Parse the JSON string into a Python dict
+    parsed_data = json.loads(json_str)
+    
+    # Check which critical fields are missing
+    missing_fields = []
+    for field in CRITICAL_FIELDS:
+        if not parsed_data.get(field):
+            missing_fields.append(field)
+    
+    # Format the response as requested
+    if status == "1":
+        message = "PDF text extraction successful"
+    else:
+        if missing_fields:
+            message = f"PDF text extraction partially successful. Missing critical fields: {', '.join(missing_fields)}"
+        else:
+            message = "PDF text extraction partially successful, some data may be missing"
+    
+    return parsed_data, message
+
+def get_image_urls(result):
+    """
+    Static URLs and descriptions of the successfully extracted images
+    """
+    images_with_urls = []
+    
+    for image in result["images"]:
+        if image["success"]:
+            images_with_urls.append({
+                "type": image["type"],
+                "url": static_store.url(image["name"]),
+                "filename": image["filename"],
+                "description": get_image_description(image["type"])
+            })
+    
+    return images_with_urls
+
+def store_files(files):
+    """
+    Move the in-memory "data" of extracted files into the static store,
+    replacing it with the stored "name"
+    """
+    for file in files:
+        data = file.pop("data", None)
+        if file["success"]:
+            extension = os.path.splitext(file["filename"])[1].lstrip(".")
+            file["name"] = static_store.put(data, extension)
+
+def stored_files_exist(files):
+    """
+    Check that the stored files of a cached extraction are still in the
+    static store, marking them as used
+    """
+    names = [file.get("name") for file in files if file["success"]]
+    return None not in names and static_store.touch(names)
 
 def get_image_description(image_type):
     """
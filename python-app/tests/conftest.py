@@ -0,0 +1,6 @@
+import os
+
+# Run PDF work inline and keep jobs in memory: the tests need no worker
+# processes nor the /app volume
+os.environ.setdefault("PDF_WORKERS", "0")
+os.environ.setdefault("JOBS_DB", "")
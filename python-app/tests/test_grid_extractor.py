@@ -0,0 +1,64 @@
+from utils.grid_extractor import read_grid
+
+# Test points of a 24-2 pattern, as (row, col) on the 8 x 9 lattice
+PATTERN_24_2 = [
+    (row, col)
+    for row, cols in enumerate([
+        range(3, 7), range(2, 8), range(1, 9), range(0, 9),
+        range(0, 9), range(1, 9), range(2, 8), range(3, 7),
+    ])
+    for col in cols
+]
+
+RECT = (100, 200, 300, 400)
+STEP = 14
+
+
+def make_words(points, offsets=None):
+    """
+    page.get_text("words") tuples printing row * 10 + col at each point,
+    moved by offsets[(row, col)] = (dx, dy)
+    """
+    offsets = offsets or {}
+    words = []
+    for row, col in points:
+        dx, dy = offsets.get((row, col), (0, 0))
+        x = RECT[0] + 20 + col * STEP + dx
+        y = RECT[1] + 20 + row * STEP + dy
+        words.append((x - 4, y - 3, x + 4, y + 3, str(row * 10 + col), 0, 0, 0))
+    return words
+
+
+def test_read_grid_24_2():
+    grid = read_grid(make_words(PATTERN_24_2), RECT)
+
+    assert (grid["rows"], grid["cols"], grid["points"]) == (8, 9, 54)
+    assert grid["values"][0] == [None, None, None, 3, 4, 5, 6, None, None]
+    assert grid["values"][3][0] == 30
+
+
+def test_read_grid_off_center_values():
+    # Values printed a few points off their test point keep the lattice
+    offsets = {(0, 3): (4, 0), (3, 0): (-4, 3), (4, 8): (3, -4), (7, 5): (0, 4)}
+    grid = read_grid(make_words(PATTERN_24_2, offsets), RECT)
+
+    assert (grid["rows"], grid["cols"], grid["points"]) == (8, 9, 54)
+    for row, col in PATTERN_24_2:
+        assert grid["values"][row][col] == row * 10 + col
+
+
+def test_read_grid_empty_column():
+    # A column without values inside the grid still gets its index
+    points = [(row, col) for row, col in PATTERN_24_2 if col != 4]
+    grid = read_grid(make_words(points), RECT)
+
+    assert (grid["rows"], grid["cols"]) == (8, 9)
+    assert [row[4] for row in grid["values"]] == [None] * 8
+    assert grid["values"][3][5] == 35
+
+
+def test_read_grid_ignores_words_outside():
+    words = make_words(PATTERN_24_2) + [(10, 10, 20, 20, "12", 0, 0, 0), (150, 250, 160, 260, "dB", 0, 0, 0)]
+    grid = read_grid(words, RECT)
+
+    assert grid["points"] == 54
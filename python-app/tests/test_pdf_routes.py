@@ -0,0 +1,108 @@
+import fitz
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from routes import pdf_routes
+from routes.pdf_routes import TextRequest, get_extract_text_response
+
+# The routes alone, without the server's warm-up, jobs and static files
+app = FastAPI()
+app.include_router(pdf_routes.router, prefix="/api")
+client = TestClient(app)
+
+
+def make_pdf(pages):
+    """
+    Bytes of a PDF with one page per list of (text, x, y) lines
+    """
+    doc = fitz.open()
+    for lines in pages:
+        page = doc.new_page(width=612, height=792)
+        for text, x, y in lines:
+            page.insert_text((x, y), text, fontsize=8)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def make_report(patient, patient_id):
+    return [
+        (f"Patient: {patient}", 36, 40),
+        (f"Patient ID: {patient_id}", 36, 50),
+        ("OD", 36, 70),
+        ("Single Field Analysis", 36, 80),
+        ("Central 24-2 Threshold Test", 36, 90),
+    ]
+
+
+@pytest.fixture
+def two_reports():
+    return make_pdf([make_report("Jane Doe", "1001"), make_report("John Roe", "1002")])
+
+
+def test_text_without_range_merges_pages(two_reports):
+    # Without a page range every page is read, later pages replacing
+    # the values of earlier ones
+    response = get_extract_text_response(TextRequest(pdf_path="two.pdf"), two_reports)
+
+    assert "pages" not in response["data"]
+    assert response["data"]["text"]["Patient"] == "John Roe"
+    assert response["data"]["text"]["Patient ID"] == "1002"
+
+
+def test_text_without_range_max_pages(two_reports):
+    response = get_extract_text_response(TextRequest(pdf_path="two.pdf", max_pages=1), two_reports)
+
+    assert response["data"]["text"]["Patient"] == "Jane Doe"
+
+
+def test_text_page_range(two_reports, monkeypatch):
+    digests = []
+    source_digest = pdf_routes.source_digest
+    monkeypatch.setattr(pdf_routes, "source_digest", lambda source: digests.append(1) or source_digest(source))
+
+    response = get_extract_text_response(TextRequest(pdf_path="two.pdf", first_page=1), two_reports)
+
+    pages = response["data"]["pages"]
+    assert [page["page"] for page in pages] == [1, 2]
+    assert [page["text"]["Patient"] for page in pages] == ["Jane Doe", "John Roe"]
+    assert response["data"]["skipped_pages"] == []
+    # The PDF is hashed once for the cache keys of all pages
+    assert len(digests) == 1
+
+
+@pytest.fixture
+def two_reports_path(two_reports, tmp_path):
+    path = tmp_path / "two.pdf"
+    path.write_bytes(two_reports)
+    return str(path)
+
+
+def test_convert_pdf_page_range(two_reports_path):
+    response = client.post("/api/convert-pdf", json={"pdf_path": two_reports_path, "first_page": 2, "last_page": 2})
+
+    assert response.status_code == 200
+    assert response.json()["image_paths"][0].endswith("_page2.jpg")
+
+
+@pytest.mark.parametrize("endpoint", ["convert-pdf", "extract-text", "extract-images"])
+def test_page_range_past_the_end(endpoint, two_reports_path):
+    response = client.post(f"/api/{endpoint}", json={"pdf_path": two_reports_path, "first_page": 3, "last_page": 4})
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "first_page 3 is beyond the last page of the PDF (2 pages)"
+
+
+@pytest.mark.parametrize("endpoint", ["convert-pdf", "extract-text", "extract-images"])
+def test_page_range_inverted(endpoint, two_reports_path):
+    response = client.post(f"/api/{endpoint}", json={"pdf_path": two_reports_path, "first_page": 2, "last_page": 1})
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "last_page must not be before first_page"
+
+
+def test_batch_page_range_inverted(two_reports_path):
+    response = client.post("/api/batch", json={"pdf_paths": [two_reports_path], "first_page": 2, "last_page": 1})
+
+    assert response.status_code == 400
@@ -0,0 +1,18 @@
+import os
+import time
+
+from utils.result_cache import ResultCache
+
+
+def test_disk_tier_keeps_recently_used_entries_within_budget(tmp_path):
+    cache = ResultCache(disk_dir=str(tmp_path / "results"), disk_max_bytes=3000)
+    for index in range(10):
+        cache.set(f"key{index}", {"value": "x" * 500})
+        written = time.time() - 100 + index
+        os.utime(cache._disk_path(f"key{index}"), (written, written))
+
+    # A read from another process marks the oldest entry as used
+    assert ResultCache(disk_dir=cache.disk_dir).get("key0") == {"value": "x" * 500}
+    cache.disk_store.sweep()
+
+    assert sorted(os.listdir(cache.disk_dir)) == ["key0.json", "key6.json", "key7.json", "key8.json", "key9.json"]
@@ -0,0 +1,23 @@
+import os
+import time
+
+from utils.static_store import StaticStore
+
+
+def test_sweep_leaves_writes_in_progress(tmp_path):
+    store = StaticStore(str(tmp_path), max_age=0, max_bytes=1000)
+    name = store.put(b"x" * 800, "png")
+    directory = os.path.dirname(store.path(name))
+
+    # A write still in progress and one left behind by a crash an hour ago
+    with open(os.path.join(directory, "new.png.1.1.tmp"), "wb") as f:
+        f.write(b"y" * 800)
+    stale = os.path.join(directory, "old.png.1.2.tmp")
+    with open(stale, "wb") as f:
+        f.write(b"z" * 800)
+    written = time.time() - 2 * store.tmp_grace
+    os.utime(stale, (written, written))
+
+    assert store.sweep() == 0
+    assert sorted(os.listdir(directory)) == sorted([os.path.basename(name), "new.png.1.1.tmp"])
+    assert (store.files, store.size) == (1, 800)
@@ -0,0 +1,57 @@
+import fitz
+
+from utils.text_extractor import PageLayout, parse_patient_details
+
+
+def make_page(lines):
+    """
+    Page of a new document printing each text at (x, y)
+    """
+    doc = fitz.open()
+    page = doc.new_page(width=612, height=792)
+    for text, x, y in lines:
+        page.insert_text((x, y), text, fontsize=8)
+    return doc, page
+
+
+def test_test_type_around_title():
+    doc, page = make_page([
+        ("OD", 36, 40),
+        ("Single Field Analysis", 36, 50),
+        ("Central 24-2 Threshold Test", 36, 60),
+    ])
+    details = PageLayout(page).details()
+    doc.close()
+
+    assert details["Eye"] == "OD"
+    assert details["Test Type"] == "Central 24-2 Threshold Test"
+    assert details["Grid"] == "24-2"
+
+
+def test_test_type_skips_labels():
+    # No test type line: the labels around the title are not its values
+    doc, page = make_page([
+        ("Date:", 36, 40),
+        ("Single Field Analysis", 36, 50),
+        ("Patient:", 36, 60),
+        ("Jane Doe", 80, 60),
+    ])
+    details = PageLayout(page).details()
+    doc.close()
+
+    assert details["Eye"] is None
+    assert details["Test Type"] is None
+    assert details["Grid"] is None
+    assert details["Patient"] == "Jane Doe"
+
+
+def test_line_parser_label_on_last_lines():
+    # Labels whose values would follow past the end of the page stay empty
+    details = parse_patient_details("Patient:\nJane Doe\nStimulus:\nBackground:")
+    assert details["Patient"] == "Jane Doe"
+    assert details["Stimulus"] is None
+    assert details["Background"] is None
+
+    details = parse_patient_details("Gender: F\nAge:")
+    assert details["Gender"] == "F"
+    assert details["Age"] is None
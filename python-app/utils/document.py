@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+import io
+import os
+import sys
+
+from utils.image_extractor import REGIONS, extract_regions, render_page
+from utils.pdf_source import open_pdf
+from utils.text_extractor import format_text_result, parse_layout_details
+
+
+class DocumentSession:
+    """
+    A PDF (a path or the bytes of the file) opened once and shared by every
+    extractor that needs it.
+
+    The parsed fields and the first-page render are computed on first use
+    and kept, so fields, region images and a preview cost one open, one
+    text pass and one render between them.
+    """
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.doc = open_pdf(file_path)
+        self._details = None
+        self._page_image = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.doc.close()
+
+    def patient_details(self):
+        """
+        Patient details parsed from the text layout (see parse_layout_details)
+        """
+        if self._details is None:
+            self._details = parse_layout_details(self.doc)
+        return self._details
+
+    def page_image(self):
+        """
+        Full render of the first page
+        """
+        if self._page_image is None:
+            self._page_image = render_page(self.doc[0])
+        return self._page_image
+
+
+def analyze_pdf(pdf_file, output_path, regions=REGIONS, preview_filename="page_preview.jpg"):
+    """
+    Extract patient details, region images and a first-page preview from a
+    PDF with a single open and a single render.
+
+    Returns a dict with the extract_text_from_pdf result string under "text",
+    the extract_images_from_pdf style information under "images" and the
+    preview file under "preview". With output_path None nothing is written
+    and the images and preview carry their encoded bytes under "data".
+    pdf_file may be a path or the bytes of the PDF.
+    """
+    # Make sure output directory exists
+    if output_path is not None:
+        os.makedirs(output_path, exist_ok=True)
+
+    with DocumentSession(pdf_file) as session:
+        text_result = format_text_result(session.patient_details())
+        page_image = session.page_image()
+
+    # Cut the regions out of the same render used for the preview
+    image_info = extract_regions(page_image, output_path, regions)
+
+    preview = {
+        "filename": preview_filename,
+        "success": None
+    }
+    try:
+        if output_path is None:
+            buffer = io.BytesIO()
+            page_image.save(buffer, 'JPEG')
+            preview["data"] = buffer.getvalue()
+        else:
+            preview["path"] = os.path.join(output_path, preview_filename)
+            page_image.save(preview["path"], 'JPEG')
+        preview["success"] = True
+    except Exception as e:
+        print(f"Error saving page preview: {e}")
+        preview["success"] = False
+
+    return {
+        "text": text_result,
+        "images": image_info,
+        "preview": preview
+    }
+
+if __name__ == "__main__":
+    # Usage: python -m utils.document <pdf file> [output dir]
+    pdf_file = sys.argv[1]
+    output_path = sys.argv[2] if len(sys.argv) > 2 else "output"
+
+    print(analyze_pdf(pdf_file, output_path))
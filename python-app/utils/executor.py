@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+import contextvars
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from utils.metrics import record_stage, timed_call
+
+
+# Number of worker processes used for PDF work (0 runs tasks inline)
+WORKERS = int(os.environ.get("PDF_WORKERS", os.cpu_count() or 1))
+
+# Recycle a worker process after this many tasks (0 never recycles)
+MAX_TASKS_PER_CHILD = int(os.environ.get("PDF_MAX_TASKS_PER_CHILD", "0"))
+
+# Tasks allowed to wait for a free worker before new ones are rejected
+QUEUE_DEPTH = int(os.environ.get("PDF_QUEUE_DEPTH", str(max(WORKERS, 1) * 4)))
+
+# Seconds between two checks for cancellation while waiting for a task
+CANCEL_POLL_INTERVAL = 0.1
+
+# Seconds between two submissions of a task the full queue rejected
+BUSY_RETRY_INTERVAL = 0.25
+
+# threading.Event set when the request behind the current call is given up
+# (see utils.limits); tasks run for it are dropped instead of awaited
+current_cancel = contextvars.ContextVar("current_cancel", default=None)
+
+
+# Seconds each start-up task holds its worker, so every worker gets one
+START_HOLD = 0.25
+
+
+def get_worker_pid(hold=0):
+    """
+    Process id of the worker running this task, after hold seconds
+    """
+    time.sleep(hold)
+    return os.getpid()
+
+
+class QueueFullError(Exception):
+    """
+    Raised when a task is submitted while the executor queue is full
+    """
+
+
+class TaskCancelledError(Exception):
+    """
+    Raised when the request waiting for a task was cancelled
+    """
+
+
+def is_cancelled():
+    """
+    Whether the request behind the current call was cancelled
+    """
+    cancel = current_cancel.get()
+    return cancel is not None and cancel.is_set()
+
+
+class PdfExecutor:
+    """
+    Process pool for CPU-bound PDF work.
+
+    Rendering, PIL work and text parsing hold the GIL, so running them on
+    FastAPI's threadpool serializes requests. Tasks submitted here run in
+    separate processes instead. At most workers + queue_depth tasks are
+    accepted at once; beyond that submit raises QueueFullError so callers
+    can shed load. Every worker process runs initializer, if set, before
+    its first task.
+    """
+
+    def __init__(self, workers=WORKERS, max_tasks_per_child=MAX_TASKS_PER_CHILD,
+                 queue_depth=QUEUE_DEPTH, initializer=None):
+        self.workers = workers
+        self.max_tasks_per_child = max_tasks_per_child
+        self.queue_depth = queue_depth
+        self.initializer = initializer
+        self.pending = 0
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        if self._pool is None:
+            kwargs = {
+                "max_workers": self.workers,
+                # Never fork the server process: it already runs threads
+                "mp_context": multiprocessing.get_context("spawn"),
+            }
+            if self.initializer is not None:
+                kwargs["initializer"] = self.initializer
+            # max_tasks_per_child is only available from Python 3.11
+            if self.max_tasks_per_child and sys.version_info >= (3, 11):
+                kwargs["max_tasks_per_child"] = self.max_tasks_per_child
+            self._pool = ProcessPoolExecutor(**kwargs)
+        return self._pool
+
+    def start(self, initializer=None):
+        """
+        Start all worker processes now instead of on the first tasks, and
+        wait until they are up. initializer (a module-level function) is
+        also run by the workers started later, e.g. after a crash or a
+        recycle. Returns the number of worker processes started.
+        """
+        if initializer is not None:
+            self.initializer = initializer
+        if self.workers <= 0:
+            return 0
+        if self.max_tasks_per_child and sys.version_info < (3, 11):
+            print(f"Warning: PDF_MAX_TASKS_PER_CHILD={self.max_tasks_per_child} is ignored, "
+                  f"worker recycling needs Python 3.11 or later")
+
+        # Workers are spawned on demand: one task per worker, each keeping
+        # its worker busy for a moment, starts all of them
+        with self._lock:
+            pool = self._get_pool()
+            futures = [pool.submit(get_worker_pid, START_HOLD) for _ in range(self.workers)]
+        return len({future.result() for future in futures})
+
+    def _task_done(self, future):
+        with self._lock:
+            self.pending -= 1
+
+    def _discard_pool(self, pool):
+        """
+        Shut down a broken pool, and start a new one on the next task
+        unless another thread already did. Called with the lock held.
+        """
+        if self._pool is pool:
+            self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, fn, args, kwargs):
+        with self._lock:
+            if self.pending >= self.workers + self.queue_depth:
+                raise QueueFullError("PDF worker queue is full")
+            self.pending += 1
+            try:
+                pool = self._get_pool()
+                try:
+                    future = pool.submit(fn, *args, **kwargs)
+                except BrokenProcessPool:
+                    # A worker died (e.g. crashed inside MuPDF); start a new pool
+                    self._discard_pool(pool)
+                    pool = self._get_pool()
+                    future = pool.submit(fn, *args, **kwargs)
+            except Exception:
+                self.pending -= 1
+                raise
+
+        future.add_done_callback(self._task_done)
+        return pool, future
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Submit fn(*args, **kwargs) to the pool and return its Future.
+
+        fn and its arguments must be picklable (module-level functions).
+        """
+        return self._submit(fn, args, kwargs)[1]
+
+    def run(self, fn, *args, **kwargs):
+        """
+        Run fn(*args, **kwargs) on the pool and wait for its result.
+
+        Stage timings recorded in the worker are recorded again here, so
+        they reach the metrics of the server process. If the current
+        request is cancelled while it waits, a task still queued is dropped
+        (one already running finishes unobserved) and TaskCancelledError is
+        raised.
+        """
+        if self.workers <= 0:
+            return fn(*args, **kwargs)
+
+        if is_cancelled():
+            raise TaskCancelledError("Request was cancelled")
+
+        pool, future = self._submit(timed_call, (fn, args, kwargs, time.time()), {})
+        try:
+            if current_cancel.get() is not None:
+                while not wait([future], timeout=CANCEL_POLL_INTERVAL).done:
+                    if is_cancelled():
+                        future.cancel()
+                        raise TaskCancelledError("Request was cancelled")
+            result, timings = future.result()
+        except BrokenProcessPool:
+            with self._lock:
+                self._discard_pool(pool)
+            raise
+
+        for stage, seconds in timings:
+            record_stage(stage, seconds)
+        return result
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+
+# Shared executor used by the routes
+executor = PdfExecutor()
+
+
+def run_when_free(fn, *args, **kwargs):
+    """
+    Call fn(*args, **kwargs), waiting for room in the executor queue
+    while it raises QueueFullError.
+
+    For work that is part of a larger request (a batch file, a page), so a
+    busy server makes it slower instead of failing it. Gives up with
+    TaskCancelledError once the current request is cancelled.
+    """
+    while True:
+        if is_cancelled():
+            raise TaskCancelledError("Request was cancelled")
+        try:
+            return fn(*args, **kwargs)
+        except QueueFullError:
+            time.sleep(BUSY_RETRY_INTERVAL)
+
+
+def iter_completed(fn, items, max_workers):
+    """
+    Run fn(item) for every item on a thread pool and yield (index, result)
+    pairs as each call finishes.
+
+    At most max_workers calls are in flight at a time and finished results
+    are not kept, so memory stays bounded however many items there are.
+    fn should catch its own exceptions. Calls run in copies of the
+    caller's context, and no new call is started once the current request
+    is cancelled.
+    """
+    items = iter(enumerate(items))
+    pending = {}
+
+    with ThreadPoolExecutor(max_workers=max(max_workers, 1)) as pool:
+        def submit_next():
+            if is_cancelled():
+                return False
+            for index, item in items:
+                pending[pool.submit(contextvars.copy_context().run, fn, item)] = index
+                return True
+            return False
+
+        for _ in range(max(max_workers, 1)):
+            if not submit_next():
+                break
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                submit_next()
+                yield index, future.result()
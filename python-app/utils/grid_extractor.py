@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+import math
+import re
+import statistics
+import sys
+from array import array
+
+from utils.image_extractor import REGIONS, get_region_rect
+from utils.metrics import span
+from utils.pdf_source import open_pdf
+
+# Bump whenever extracted grids change, to invalidate cached results
+GRID_EXTRACTOR_VERSION = "2"
+
+# Regions whose plots print one number per test point
+GRID_REGIONS = ("sensitivity_values", "total_deviation_values", "pattern_deviation_values")
+
+# Array types of packed grids: array typecode, and the value of cells
+# without a printed number (blind spots and cells outside the pattern)
+GRID_DTYPES = {
+    "float32": ("f", math.nan),
+    "int8": ("b", -128),
+}
+
+# Printed values whose centers are closer than this, in points, share a
+# row or column of the grid
+CLUSTER_TOLERANCE = 3
+
+# A printed value: whole dB, or "<0" for a point seen at no stimulus level
+VALUE_PATTERN = re.compile(r"^(<?)(-?\d+)$")
+
+
+def parse_value(text):
+    """
+    Value of a printed grid number; "<0" is returned as -1. None for any
+    other text.
+    """
+    match = VALUE_PATTERN.match(text)
+    if match is None:
+        return None
+    value = int(match.group(2))
+    return value - 1 if match.group(1) else value
+
+
+def cluster_positions(coordinates, tolerance):
+    """
+    Centers of the groups of sorted coordinates, a group ending where the
+    next coordinate is farther than tolerance from its first one
+    """
+    positions = []
+    cluster = []
+    for coordinate in coordinates:
+        if cluster and coordinate - cluster[0] > tolerance:
+            positions.append(sum(cluster) / len(cluster))
+            cluster = []
+        cluster.append(coordinate)
+    positions.append(sum(cluster) / len(cluster))
+    return positions
+
+
+def get_axis(coordinates):
+    """
+    (indexes, size): the index along one axis of each coordinate, on
+    the evenly spaced positions they were printed at, and the number of
+    positions.
+    
+    The step is the median gap between neighbouring groups of coordinates,
+    so rows or columns left empty inside the grid still get their index
+    and a value printed a few points off its test point changes neither
+    the step nor the number of positions. The origin is fitted to every
+    group, and each coordinate is snapped to the nearest position.
+    """
+    ordered = sorted(coordinates)
+    positions = cluster_positions(ordered, CLUSTER_TOLERANCE)
+    if len(positions) < 2:
+        return [0] * len(coordinates), 1
+    
+    step = statistics.median(b - a for a, b in zip(positions, positions[1:]))
+    # Regroup with a tolerance tied to the step, merging off-center values
+    positions = cluster_positions(ordered, step / 2)
+    origin = statistics.median(
+        position - round((position - positions[0]) / step) * step for position in positions
+    )
+    
+    indexes = [int(round((coordinate - origin) / step)) for coordinate in coordinates]
+    first = min(indexes)
+    return [index - first for index in indexes], max(indexes) - first + 1
+
+
+def read_grid(words, rect):
+    """
+    Grid of the numbers printed inside rect.
+    
+    words are page.get_text("words") tuples. Returns a dict with the grid
+    "rows" and "cols", the number of "points" read and the "values" as a
+    list of rows, None marking cells without a printed number.
+    """
+    x0, y0, x1, y1 = rect
+    points = []
+    for wx0, wy0, wx1, wy1, text, *_ in words:
+        x, y = (wx0 + wx1) / 2, (wy0 + wy1) / 2
+        if not (x0 <= x <= x1 and y0 <= y <= y1):
+            continue
+        value = parse_value(text)
+        if value is not None:
+            points.append((x, y, value))
+    
+    if not points:
+        return {"rows": 0, "cols": 0, "points": 0, "values": []}
+    
+    col_indexes, cols = get_axis([x for x, _, _ in points])
+    row_indexes, rows = get_axis([y for _, y, _ in points])
+    
+    values = [[None] * cols for _ in range(rows)]
+    for row, col, (_, _, value) in zip(row_indexes, col_indexes, points):
+        values[row][col] = value
+    
+    return {"rows": rows, "cols": cols, "points": len(points), "values": values}
+
+
+def pack_grid(grid, dtype="float32"):
+    """
+    Values of a read_grid grid as a row-major little-endian array of dtype
+    (see GRID_DTYPES), in bytes
+    """
+    typecode, missing = GRID_DTYPES[dtype]
+    if typecode == "b":
+        # Keep values in the int8 range; -128 marks missing cells
+        cells = (missing if value is None else max(-127, min(127, value))
+                 for row in grid["values"] for value in row)
+    else:
+        cells = (missing if value is None else value for row in grid["values"] for value in row)
+    
+    packed = array(typecode, cells)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def extract_grids_from_pdf(pdf_file, regions=REGIONS):
+    """
+    Read the numeric grids of the value plots of a report from the text
+    layer of its first page, without rendering it.
+    
+    Every region of regions listed in GRID_REGIONS is read from the words
+    inside its rectangle (see read_grid). pdf_file may be a path or the
+    bytes of the PDF.
+    
+    Returns {"grids": {region type: grid}, "status": bool}, status being
+    False when a plot has no numbers.
+    """
+    doc = open_pdf(pdf_file)
+    try:
+        with span("text"):
+            words = doc[0].get_text("words")
+    finally:
+        doc.close()
+    
+    with span("parse"):
+        grids = {
+            region["type"]: read_grid(words, get_region_rect(region))
+            for region in regions if region["type"] in GRID_REGIONS
+        }
+    
+    return {
+        "grids": grids,
+        "status": all(grid["points"] for grid in grids.values())
+    }
+
+
+if __name__ == "__main__":
+    # Usage: python -m utils.grid_extractor <pdf file>
+    result = extract_grids_from_pdf(sys.argv[1])
+    for region_type, grid in result["grids"].items():
+        print(f"{region_type}: {grid['rows']}x{grid['cols']}, {grid['points']} points")
+        for row in grid["values"]:
+            print(" ".join("  ." if value is None else f"{value:3d}" for value in row))
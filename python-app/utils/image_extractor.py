@@ -1,235 +1,421 @@
 #!/usr/bin/env python3
 import fitz
+import io
 import os
+from functools import lru_cache
 from PIL import Image, ImageDraw
 import json
 import sys
 import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 
+from utils.metrics import span
+from utils.pdf_source import open_pdf
+
+# Bump whenever extracted images change, to invalidate cached results
+IMAGE_EXTRACTOR_VERSION = "1"
+
+# Default render zoom (render pixels per PDF point) used for region
+# extraction; a request can pick another scale to trade detail for speed
+ZOOM = 2
+
+# Extra pixels rendered around each region when clipping. Pixels on the edge
+# of a clipped render can be anti-aliased slightly differently from the
+# same pixels in a full-page render, so keep that edge out of every crop.
+CLIP_MARGIN = 4
+
+
+# Supported output formats: PIL format and file extension
+IMAGE_FORMATS = {
+    "jpeg": ("JPEG", "jpg"),
+    "png": ("PNG", "png"),
+    "webp": ("WEBP", "webp"),
+}
+
+
+# Encoding of region images
+DEFAULT_ENCODER = {
+    "format": "png",
+    # zlib level for PNG, 0 (fastest) to 9 (smallest)
+    "compress_level": 6,
+    # Quality for WebP and JPEG, 1 to 100
+    "quality": 85,
+    # Quantize PNGs to a palette of this many colors (None keeps RGBA)
+    "colors": None,
+}
+
+# Threads used to crop and encode the regions of one page concurrently
+WRITE_THREADS = int(os.environ.get("IMAGE_WRITE_THREADS", "4"))
 
-def convert_pdf2img(input_file: str):
-    # Open the document
-    pdfIn = fitz.open(input_file)
 
-    # Select a page
-    page = pdfIn[0]
+def get_page_matrix(zoom=ZOOM):
     rotate = int(0)
-    zoom_x = 2
-    zoom_y = 2
+    zoom_x = zoom
+    zoom_y = zoom
+
+    return fitz.Matrix(zoom_x, zoom_y).prerotate(rotate)
+
+
+def get_render_size(page, zoom=ZOOM):
+    """
+    Size in pixels of a full render of page at zoom
+    """
+    irect = page.rect.transform(get_page_matrix(zoom)).irect
+    return irect.width, irect.height
+
+
+@span("render")
+def render_page(page, clip=None, matrix=None):
+    """
+    Rasterize a page into an RGB PIL image.
+    
+    clip is an optional (left, upper, right, lower) box in render pixels;
+    when given only that part of the page is rasterized. matrix defaults to
+    the ZOOM render used for region extraction.
+    """
+    mat = matrix if matrix is not None else get_page_matrix()
+    if clip is not None:
+        clip = fitz.Rect(clip) * ~mat
+
+    pix = page.get_pixmap(matrix=mat, clip=clip, alpha=False)
+
+    # Read straight from the pixmap buffer rather than copying pix.samples
+    return Image.frombuffer("RGB", (pix.width, pix.height), pix.samples_mv,
+                            "raw", "RGB", pix.stride, 1)
+
 
-    mat = fitz.Matrix(zoom_x, zoom_y).prerotate(rotate)
-    pix = page.get_pixmap(matrix=mat, alpha=False)
-    image_data = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+def convert_pdf2img(input_file: str, clip=None, zoom=ZOOM, page_number=1):
+    # Open the document
+    pdfIn = open_pdf(input_file)
+
+    # Select a page (1-based)
+    page = pdfIn[page_number - 1]
+    image_data = render_page(page, clip, get_page_matrix(zoom))
     pdfIn.close()
 
     return image_data
 
 
-def get_gray_scale(img, output_path: str):
-    # crop image
-    width, height = img.size
-    x = (width - height)//2
-    img_cropped = img.crop((653, 430, x+height, height))
+def get_page_count(pdf_file: str):
+    pdfIn = open_pdf(pdf_file)
+    page_count = pdfIn.page_count
+    pdfIn.close()
+    
+    return page_count
 
-    # create grayscale image
-    mask = Image.new('L', img_cropped.size)
-    mask_draw = ImageDraw.Draw(mask)
-    mask_draw.ellipse((0, 0, 382, 390), fill=255)
 
-    # add mask as alpha channel
-    img_cropped.putalpha(mask)
+def new_image_name(prefix="converted"):
+    """
+    Base name for converted page images. The random token next to the
+    timestamp keeps concurrent requests from colliding.
+    """
+    return f"{prefix}_{int(time.time())}_{uuid.uuid4().hex[:12]}"
+
+
+def convert_pdf_pages(pdf_file: str, output_dir: str, dpi=200, first_page=1,
+                      last_page=1, image_format="jpeg", name=None):
+    """
+    Render pages of a PDF to image files in-process with PyMuPDF.
     
-    # Trim unnecessary whitespace
-    img_cropped = trim_whitespace(img_cropped)
+    Pages first_page to last_page (1-based, inclusive) are rendered at dpi;
+    a last_page of None renders to the end of the document. Files are named
+    <name>_page<n>; name defaults to new_image_name().
     
-    flag = None
-    try:
-        imagePath = os.path.join(output_path, 'gray_scale_image.png')
-        img_cropped.save(imagePath)
-        flag = True
-    except ValueError as e:
-        print(f"Error saving gray scale image: {e}")
-        flag = False
-
-    return flag, 'gray_scale_image.png'
+    Returns the list of written image paths.
+    """
+    pil_format, extension = IMAGE_FORMATS[image_format]
+    
+    # Make sure output directory exists
+    os.makedirs(output_dir, exist_ok=True)
+    
+    pdfIn = open_pdf(pdf_file)
+    
+    # Clamp the requested range to the document
+    first = max(first_page, 1)
+    last = pdfIn.page_count if last_page is None else min(last_page, pdfIn.page_count)
+    
+    mat = fitz.Matrix(dpi / 72, dpi / 72)
+    if name is None:
+        name = new_image_name()
+    
+    image_paths = []
+    for page_number in range(first, last + 1):
+        image = render_page(pdfIn[page_number - 1], matrix=mat)
+        image_path = os.path.join(output_dir, f"{name}_page{page_number}.{extension}")
+        image.save(image_path, pil_format)
+        image_paths.append(image_path)
+    
+    pdfIn.close()
+    
+    return image_paths
+
+
+# Regions cut from the page, in extraction order. Coordinates are in PDF
+# points, so the same table works at any render zoom (see scale_regions).
+#   crop:     (left, upper, right, lower) on the page. A None right/lower
+#             edge extends to (width + height) // 2 / height of the render,
+#             i.e. the bound of the page's centred square.
+#   mask:     shape drawn into the alpha mask ("ellipse" or "rectangle")
+#   mask_box: bounds of that shape inside the cropped image
+#   filename: name of the PNG written to the output directory
+REGIONS = [
+    {"type": "gray_scale", "crop": (326.5, 215, None, None),
+     "mask": "ellipse", "mask_box": (0, 0, 191, 195),
+     "filename": "gray_scale_image.png"},
+    {"type": "sensitivity_values", "crop": (122.5, 212.5, None, None),
+     "mask": "ellipse", "mask_box": (0, 0, 191, 195),
+     "filename": "sensitivity_values_image.png"},
+    {"type": "total_deviation_values", "crop": (60.5, 380.5, None, None),
+     "mask": "ellipse", "mask_box": (0, 0, 130, 135),
+     "filename": "total_deviation_values_image.png"},
+    {"type": "pattern_deviation_values", "crop": (243.5, 381, None, None),
+     "mask": "ellipse", "mask_box": (0, 0, 130, 135),
+     "filename": "pattern_deviation_values_image.png"},
+    {"type": "td_probability_values", "crop": (62.5, 523, None, None),
+     "mask": "ellipse", "mask_box": (0, 0, 130, 135),
+     "filename": "TD_probability_values_image.png"},
+    {"type": "pd_probability_values", "crop": (246.5, 523, None, None),
+     "mask": "ellipse", "mask_box": (0, 0, 130, 135),
+     "filename": "PD_probability_values_image.png"},
+    # Crop coordinates focus on the legend content
+    {"type": "legend", "crop": (505, 592.5, 505 + 65, 592.5 + 65),
+     "mask": "rectangle", "mask_box": (0, 0, 65, 65),
+     "filename": "legend_image.png"},
+]
+
+
+def scale_box(box, zoom):
+    return tuple(None if value is None else int(round(value * zoom)) for value in box)
+
+
+def scale_regions(regions, zoom=ZOOM):
+    """
+    Regions with their crop and mask boxes converted from PDF points to
+    pixels of a render at zoom.
+    
+    Every function below that takes a rendered image works on scaled
+    regions; extract_images_from_pdf, render_regions and extract_regions
+    take regions in points and scale them themselves.
+    """
+    return [
+        dict(region, crop=scale_box(region["crop"], zoom), mask_box=scale_box(region["mask_box"], zoom))
+        for region in regions
+    ]
 
 
-def get_sensitivity_values(img, output_path: str):
-    # crop image
-    width, height = img.size
-    x = (width - height)//2
-    img_cropped = img.crop((245, 425, x+height, height))
+def get_region_rect(region):
+    """
+    Rectangle (x0, y0, x1, y1) of a region's mask shape on the page, in
+    PDF points
+    """
+    left, upper = region["crop"][:2]
+    x0, y0, x1, y1 = region["mask_box"]
+    return (left + x0, upper + y0, left + x1, upper + y1)
 
-    # create grayscale image
-    mask = Image.new('L', img_cropped.size)
-    mask_draw = ImageDraw.Draw(mask)
-    mask_draw.ellipse((0, 0, 382, 390), fill=255)
 
-    # add mask as alpha channel
-    img_cropped.putalpha(mask)
+def get_crop_box(region, image_size):
+    """
+    Resolve a scaled region's crop box against the size of the rendered page
+    """
+    width, height = image_size
+    left, upper, right, lower = region["crop"]
     
-    # Trim unnecessary whitespace
-    img_cropped = trim_whitespace(img_cropped)
+    if right is None:
+        right = (width - height)//2 + height
+    if lower is None:
+        lower = height
     
-    flag = None
-    try:
-        imagePath = os.path.join(output_path, "sensitivity_values_image.png")
-        img_cropped.save(imagePath)
-        flag = True
-    except Exception as e:
-        print(f"Error saving sensitivity values image: {e}")
-        flag = False
+    return (left, upper, right, lower)
 
-    return flag, 'sensitivity_values_image.png'
 
+def get_region_bounds(region, image_size):
+    """
+    Part of the render a region can contribute to its output image.
+    
+    Everything outside the mask is transparent and trimmed away, so only the
+    mask bounds (plus the trim padding and CLIP_MARGIN) have to be rendered.
+    """
+    left, upper, right, lower = get_crop_box(region, image_size)
+    x0, y0, x1, y1 = region["mask_box"]
+    
+    # Mask shapes include their right/lower edge
+    return (
+        max(left, left + x0 - 2 - CLIP_MARGIN),
+        max(upper, upper + y0 - 2 - CLIP_MARGIN),
+        min(right, left + x1 + 1 + 2 + CLIP_MARGIN),
+        min(lower, upper + y1 + 1 + 2 + CLIP_MARGIN),
+    )
 
-def get_total_deviation_values(img, output_path: str):
-    # crop image
-    width, height = img.size
-    x = (width - height)//2
-    img_cropped = img.crop((121, 761, x+height, height))
 
-    # create grayscale image
-    mask = Image.new('L', img_cropped.size)
-    mask_draw = ImageDraw.Draw(mask)
-    mask_draw.ellipse((0, 0, 260, 270), fill=255)
+def get_regions_clip(regions, image_size):
+    """
+    Union of the bounds of all regions, clamped to the page render
+    """
+    width, height = image_size
+    bounds = [get_region_bounds(region, image_size) for region in regions]
+    
+    return (
+        max(0, min(box[0] for box in bounds)),
+        max(0, min(box[1] for box in bounds)),
+        min(width, max(box[2] for box in bounds)),
+        min(height, max(box[3] for box in bounds)),
+    )
+
 
-    # add mask as alpha channel
-    img_cropped.putalpha(mask)
+def render_regions(input_file: str, regions, zoom=ZOOM, page_number=1):
+    """
+    Rasterize at zoom only the part of page page_number (1-based) covered
+    by regions.
     
-    # Trim unnecessary whitespace
-    img_cropped = trim_whitespace(img_cropped)
+    Returns (image, origin, page_size): the clipped render, the position of
+    its top-left corner in the full render, and the size of the full render.
+    """
+    pdfIn = open_pdf(input_file)
+    page = pdfIn[page_number - 1]
     
-    flag = None
-    try:
-        imagePath = os.path.join(output_path, "total_deviation_values_image.png")
-        img_cropped.save(imagePath)
-        flag = True
-    except Exception as e:
-        print(f"Error saving total deviation values image: {e}")
-        flag = False
-    return flag, 'total_deviation_values_image.png'
-
+    page_size = get_render_size(page, zoom)
+    clip = get_regions_clip(scale_regions(regions, zoom), page_size)
+    image_data = render_page(page, clip, get_page_matrix(zoom))
+    pdfIn.close()
+    
+    return image_data, clip[:2], page_size
 
-def get_pattern_deviation_values(img, output_path: str):
-    # crop image
-    width, height = img.size
-    x = (width - height)//2
-    img_cropped = img.crop((487, 762, x+height, height))
 
-    # create grayscale image
-    mask = Image.new('L', img_cropped.size)
+@lru_cache(maxsize=32)
+def get_region_mask(size, shape, mask_box):
+    """
+    Build (once per size and shape) the alpha mask applied to a region crop.
+    
+    Masks are cached across requests and must be treated as read-only;
+    putalpha copies the band so sharing them is safe.
+    """
+    mask = Image.new('L', size)
     mask_draw = ImageDraw.Draw(mask)
-    mask_draw.ellipse((0, 0, 260, 270), fill=255)
-
-    # add mask as alpha channel
-    img_cropped.putalpha(mask)
     
-    # Trim unnecessary whitespace
-    img_cropped = trim_whitespace(img_cropped)
+    if shape == "ellipse":
+        mask_draw.ellipse(mask_box, fill=255)
+    elif shape == "rectangle":
+        mask_draw.rectangle(mask_box, fill=255)
+    else:
+        raise ValueError(f"Unknown mask shape: {shape}")
     
-    flag = None
-    try:
-        imagePath = os.path.join(output_path, "pattern_deviation_values_image.png")
-        img_cropped.save(imagePath)
-        flag = True
-    except Exception as e:
-        print(f"Error saving pattern deviation values image: {e}")
-        flag = False
-    return flag, 'pattern_deviation_values_image.png'
-
+    return mask
 
-def get_td_probability_values(img, output_path: str):
-    # crop image
-    width, height = img.size
-    x = (width - height)//2
-    img_cropped = img.crop((125, 1046, x+height, height))
 
-    # create grayscale image
-    mask = Image.new('L', img_cropped.size)
-    mask_draw = ImageDraw.Draw(mask)
-    mask_draw.ellipse((0, 0, 260, 270), fill=255)
+def crop_region(img, region, page_size=None, origin=(0, 0)):
+    """
+    Crop, mask and trim a single region of the rendered page.
+    
+    When img is a clipped render, page_size is the size of the full render
+    and origin the position of img inside it.
+    
+    Returns the region as an RGBA image.
+    """
+    with span("crop"):
+        # crop image
+        left, upper, right, lower = get_crop_box(region, page_size or img.size)
+        x, y = origin
+        img_cropped = img.crop((left - x, upper - y, right - x, lower - y))
 
-    # add mask as alpha channel
-    img_cropped.putalpha(mask)
+        # add mask as alpha channel
+        img_cropped.putalpha(get_region_mask(img_cropped.size, region["mask"], region["mask_box"]))
     
     # Trim unnecessary whitespace
-    img_cropped = trim_whitespace(img_cropped)
-    
-    flag = None
-    try:
-        imagePath = os.path.join(output_path, "TD_probability_values_image.png")
-        img_cropped.save(imagePath)
-        flag = True
-    except Exception as e:
-        print(f"Error saving TD probability values image: {e}")
-        flag = False
-    return flag, 'TD_probability_values_image.png'
+    with span("trim"):
+        return trim_whitespace(img_cropped)
 
 
-def get_pd_probability_values(img, output_path: str):
-    # crop image
-    width, height = img.size
-    x = (width - height)//2
-    img_cropped = img.crop((493, 1046, x+height, height))
+def get_region_filename(region, encoder=DEFAULT_ENCODER):
+    """
+    Output filename of a region, with the extension of the encoder format
+    """
+    _, extension = IMAGE_FORMATS[encoder["format"]]
+    return f"{os.path.splitext(region['filename'])[0]}.{extension}"
 
-    # create grayscale image
-    mask = Image.new('L', img_cropped.size)
-    mask_draw = ImageDraw.Draw(mask)
-    mask_draw.ellipse((0, 0, 260, 270), fill=255)
 
-    # add mask as alpha channel
-    img_cropped.putalpha(mask)
+def encode_image(image, fp, encoder=DEFAULT_ENCODER):
+    """
+    Encode an RGBA region image into fp (a file object) with the encoder
+    settings
+    """
+    image_format = encoder["format"]
+    pil_format, _ = IMAGE_FORMATS[image_format]
+    
+    if image_format == "jpeg":
+        # JPEG has no alpha channel; flatten onto white
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        image = background
+    elif image_format == "png" and encoder.get("colors"):
+        # The plots are mostly monochrome, so a small palette loses little
+        image = image.quantize(colors=encoder["colors"], method=Image.Quantize.FASTOCTREE)
+    
+    with span("encode"):
+        if image_format == "png":
+            image.save(fp, pil_format, compress_level=encoder["compress_level"])
+        else:
+            image.save(fp, pil_format, quality=encoder["quality"])
+
+
+def extract_region(img, region, output_path: str, page_size=None, origin=(0, 0),
+                   encoder=DEFAULT_ENCODER):
+    """
+    Crop, mask, trim and save a single region of the rendered page.
     
-    # Trim unnecessary whitespace
-    img_cropped = trim_whitespace(img_cropped)
+    page_size and origin describe a clipped render as in crop_region. The
+    image is encoded in memory first, so the file write is timed on its own.
+    
+    Returns a (success, filename) tuple.
+    """
+    flag, filename, data = encode_region(img, region, page_size, origin, encoder)
+    if not flag:
+        return flag, filename
     
-    flag = None
     try:
-        imagePath = os.path.join(output_path, "PD_probability_values_image.png")
-        img_cropped.save(imagePath)
-        flag = True
+        imagePath = os.path.join(output_path, filename)
+        with span("write"):
+            with open(imagePath, "wb") as f:
+                f.write(data)
     except Exception as e:
-        print(f"Error saving PD probability values image: {e}")
+        print(f"Error saving {region['type']} image: {e}")
         flag = False
-    return flag, 'PD_probability_values_image.png'
 
+    return flag, filename
 
-def get_legend(img, output_path: str):
-    # crop image
-    width, height = img.size
-    x = (width - height)//2
-    # Adjusting crop coordinates to better focus on the legend content
-    img_cropped = img.crop((1010, 1185, 1010 + 130, 1185 + 130))
 
-    # create grayscale image
-    mask = Image.new('L', img_cropped.size)
-    mask_draw = ImageDraw.Draw(mask)
-    
-    # Using rectangle
-    mask_draw.rectangle((0, 0, 130, 130), fill=255)
-    
-    # add mask as alpha channel
-    img_cropped.putalpha(mask)
+def encode_region(img, region, page_size=None, origin=(0, 0), encoder=DEFAULT_ENCODER):
+    """
+    Crop, mask, trim and encode a single region in memory.
     
-    # Trim unnecessary whitespace with smaller padding to reduce empty space
-    img_cropped = trim_whitespace(img_cropped)
+    Returns a (success, filename, data) tuple, data being the encoded bytes.
+    """
+    img_cropped = crop_region(img, region, page_size, origin)
+    filename = get_region_filename(region, encoder)
     
-    flag = None
+    buffer = io.BytesIO()
     try:
-        imagePath = os.path.join(output_path, "legend_image.png")
-        img_cropped.save(imagePath)
-        flag = True
+        encode_image(img_cropped, buffer, encoder)
     except Exception as e:
-        print(f"Error saving legend image: {e}")
-        flag = False
-    return flag, 'legend_image.png'
+        print(f"Error encoding {region['type']} image: {e}")
+        return False, filename, None
+    
+    return True, filename, buffer.getvalue()
+
+
+# Pasting an RGBA image onto a transparent canvas through its own alpha
+# rounds any alpha below 12 down to 0, so those pixels never counted as
+# content. This lookup table keeps that cut-off when thresholding the band.
+VISIBLE_ALPHA_TABLE = [0] * 12 + [255] * 244
 
 
 def trim_whitespace(image):
     """
     Trims the whitespace around an image to only keep the content.
     
+    The bounds are found with a single C-level pass over the alpha band
+    (Image.getbbox) instead of walking every pixel in Python.
+    
     Args:
         image: PIL Image object
     
@@ -240,78 +426,104 @@ def trim_whitespace(image):
     if image.mode != 'RGBA':
         image = image.convert('RGBA')
     
-    # Create a new white background image
-    bg = Image.new('RGBA', image.size, (255, 255, 255, 0))
-    
-    # Paste the image on the background using the alpha as mask
-    bg.paste(image, (0, 0), image)
-    
-    # Get the data as a numpy array
-    data = bg.getdata()
-    
-    # Find the bounds of non-transparent pixels
-    non_empty_columns = []
-    non_empty_rows = []
-    
-    for y in range(image.height):
-        for x in range(image.width):
-            if data[y * image.width + x][3] > 0:  # If alpha channel is not 0
-                non_empty_rows.append(y)
-                non_empty_columns.append(x)
+    # Find the bounds of visible pixels on the alpha band
+    bbox = image.getchannel('A').point(VISIBLE_ALPHA_TABLE).getbbox()
     
-    if not non_empty_rows or not non_empty_columns:
+    if bbox is None:
         return image  # Return original if no non-transparent pixels found
     
+    # getbbox returns an exclusive right/lower edge, so the last visible
+    # column/row is one less than reported
+    left, upper, right, lower = bbox
+    
     # Get the bounds - using smaller padding (2px instead of 5px)
-    min_x = max(0, min(non_empty_columns) - 2)
-    max_x = min(image.width, max(non_empty_columns) + 2)
-    min_y = max(0, min(non_empty_rows) - 2)
-    max_y = min(image.height, max(non_empty_rows) + 2)
+    min_x = max(0, left - 2)
+    max_x = min(image.width, (right - 1) + 2)
+    min_y = max(0, upper - 2)
+    max_y = min(image.height, (lower - 1) + 2)
     
     # Crop the image
     return image.crop((min_x, min_y, max_x, max_y))
 
 
-def extract_images_from_pdf(pdf_file, output_path):
+def extract_images_from_pdf(pdf_file, output_path, regions=REGIONS, clip=True,
+                            encoder=DEFAULT_ENCODER, zoom=ZOOM, page_number=1):
     """
     Extract images from a PDF file and save them to the specified output path.
     Returns information about the extracted images.
+    
+    regions is a region table in the same format as REGIONS, so other report
+    layouts can be extracted without new code. With clip set only the
+    union of the regions is rasterized instead of the whole page. encoder
+    holds the output format settings (see DEFAULT_ENCODER). zoom is the
+    render scale in pixels per point: 1 renders a quarter of the pixels of
+    the default 2 for quick thumbnails, higher values give sharper images.
+    page_number (1-based) selects the report page of multi-report PDFs;
+    the file names do not depend on it, so give each page its own
+    output_path.
+    
+    With output_path None nothing is written to disk and every image entry
+    carries its encoded bytes under "data" instead of a "path". pdf_file
+    may be a path or the bytes of the PDF.
     """
     # Make sure output directory exists
-    os.makedirs(output_path, exist_ok=True)
+    if output_path is not None:
+        os.makedirs(output_path, exist_ok=True)
     
     # Converting pdf to img
-    pixData = convert_pdf2img(pdf_file)
+    if clip:
+        pixData, origin, page_size = render_regions(pdf_file, regions, zoom, page_number)
+    else:
+        pixData = convert_pdf2img(pdf_file, zoom=zoom, page_number=page_number)
+        origin, page_size = (0, 0), pixData.size
     
+    return extract_regions(pixData, output_path, regions, page_size, origin, encoder, zoom)
+
+
+def extract_regions(img, output_path, regions=REGIONS, page_size=None, origin=(0, 0),
+                    encoder=DEFAULT_ENCODER, zoom=ZOOM):
+    """
+    Extract every region of a page rendered at zoom into output_path.
+    
+    Regions are cropped and encoded concurrently on WRITE_THREADS threads;
+    PIL releases the GIL while it crops and compresses. page_size and
+    origin describe a clipped render as in crop_region. With output_path
+    None the images are kept in memory (see extract_images_from_pdf).
+    
+    Returns information about the extracted images.
+    """
     # Dictionary to store image information
     image_info = {
         "images": []
     }
     
-    # Extract all image types
-    extraction_functions = [
-        ("gray_scale", get_gray_scale),
-        ("sensitivity_values", get_sensitivity_values),
-        ("total_deviation_values", get_total_deviation_values),
-        ("pattern_deviation_values", get_pattern_deviation_values),
-        ("td_probability_values", get_td_probability_values),
-        ("pd_probability_values", get_pd_probability_values),
-        ("legend", get_legend)
-    ]
-    
     all_successful = True
     
-    for image_type, extraction_func in extraction_functions:
-        success, filename = extraction_func(pixData, output_path)
+    scaled = scale_regions(regions, zoom)
+    
+    def extract(region):
+        if output_path is None:
+            return encode_region(img, region, page_size, origin, encoder)
+        return extract_region(img, region, output_path, page_size, origin, encoder) + (None,)
+    
+    # Extract all image types
+    with ThreadPoolExecutor(max_workers=max(min(WRITE_THREADS, len(regions)), 1)) as pool:
+        extracted = list(pool.map(extract, scaled))
+    
+    for region, (success, filename, data) in zip(regions, extracted):
         if not success:
             all_successful = False
         
-        image_info["images"].append({
-            "type": image_type,
-            "filename": filename,
-            "path": os.path.join(output_path, filename),
-            "success": success
-        })
+        image = {
+            "type": region["type"],
+            "filename": filename
+        }
+        if output_path is None:
+            image["data"] = data
+        else:
+            image["path"] = os.path.join(output_path, filename)
+        image["success"] = success
+        image_info["images"].append(image)
     
     image_info["status"] = all_successful
     
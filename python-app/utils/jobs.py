@@ -0,0 +1,436 @@
+#!/usr/bin/env python3
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+
+from utils.executor import QueueFullError, WORKERS
+
+
+# SQLite database keeping jobs across restarts (empty keeps them in memory)
+JOBS_DB = os.environ.get("JOBS_DB", "/app/jobs.sqlite3")
+
+# Threads dispatching queued jobs to the PDF worker pool
+JOB_THREADS = int(os.environ.get("JOB_THREADS", str(max(WORKERS, 1))))
+
+# Seconds a finished job is kept before it is deleted
+JOB_RETENTION = int(os.environ.get("JOB_RETENTION", str(7 * 24 * 60 * 60)))
+
+# Seconds a queued or running job stays leased to its process without a
+# heartbeat; past it another process sharing the store takes the job over
+JOB_LEASE = int(os.environ.get("JOB_LEASE", "60"))
+
+# Attempts and timeout (seconds) of each webhook callback
+CALLBACK_ATTEMPTS = 3
+CALLBACK_TIMEOUT = 10
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+class MemoryJobStore:
+    """
+    Job store keeping jobs in a dict; jobs are lost on restart
+    """
+
+    def __init__(self):
+        self.jobs = {}
+        self._lock = threading.Lock()
+
+    def create(self, job):
+        with self._lock:
+            self.jobs[job["id"]] = dict(job)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            if job_id in self.jobs:
+                self.jobs[job_id].update(fields)
+
+    def claim(self, job_id, started_at, owner, lease_until):
+        """
+        Mark a queued job as running, leased to owner until lease_until.
+        Returns False if it is not queued.
+        """
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None or job["status"] != QUEUED:
+                return False
+            job.update(status=RUNNING, started_at=started_at, owner=owner, lease_until=lease_until)
+            return True
+
+    def renew(self, owner, lease_until):
+        """
+        Extend the lease of the queued and running jobs of owner to
+        lease_until
+        """
+        with self._lock:
+            for job in self.jobs.values():
+                if job["status"] in (QUEUED, RUNNING) and job.get("owner") == owner:
+                    job["lease_until"] = lease_until
+
+    def release(self, owner):
+        """
+        End the lease of the queued jobs of owner, so others take them over
+        right away
+        """
+        with self._lock:
+            for job in self.jobs.values():
+                if job["status"] == QUEUED and job.get("owner") == owner:
+                    job["lease_until"] = None
+
+    def take_expired(self, now, owner, lease_until):
+        """
+        Lease the queued and running jobs whose lease expired before now
+        to owner until lease_until, marking them as queued, and return
+        their ids, oldest first
+        """
+        with self._lock:
+            jobs = [job for job in self.jobs.values()
+                    if job["status"] in (QUEUED, RUNNING) and (job.get("lease_until") or 0) < now]
+            for job in jobs:
+                job.update(status=QUEUED, started_at=None, owner=owner, lease_until=lease_until)
+            return [job["id"] for job in sorted(jobs, key=lambda job: job["created_at"])]
+
+    def purge(self, finished_before):
+        with self._lock:
+            for job_id in [job_id for job_id, job in self.jobs.items()
+                           if job["finished_at"] is not None and job["finished_at"] < finished_before]:
+                del self.jobs[job_id]
+
+
+class SqliteJobStore:
+    """
+    Job store backed by a SQLite database, so queued jobs and results
+    survive restarts of the service. Several processes may share it: a
+    queued or running job is leased to the process that queued or runs it
+    (owner, lease_until) and only taken over by another once that lease
+    expired.
+    """
+
+    # Columns holding JSON documents
+    JSON_COLUMNS = ("params", "result")
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL, "
+                "params TEXT NOT NULL, result TEXT, error TEXT, callback_url TEXT, "
+                "created_at REAL NOT NULL, started_at REAL, finished_at REAL)"
+            )
+            # Lease columns, added to databases created without them
+            columns = {row["name"] for row in db.execute("PRAGMA table_info(jobs)")}
+            for column, column_type in (("owner", "TEXT"), ("lease_until", "REAL")):
+                if column not in columns:
+                    db.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_finished_at ON jobs (finished_at)")
+
+    def _connect(self):
+        # One connection per thread; sqlite3 connections are not shared
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30)
+            db.row_factory = sqlite3.Row
+            self._local.db = db
+        return db
+
+    def create(self, job):
+        row = dict(job)
+        for column in self.JSON_COLUMNS:
+            row[column] = json.dumps(row[column]) if row[column] is not None else None
+        columns = ", ".join(row)
+        placeholders = ", ".join(f":{column}" for column in row)
+        with self._connect() as db:
+            db.execute(f"INSERT INTO jobs ({columns}) VALUES ({placeholders})", row)
+
+    def get(self, job_id):
+        row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        for column in self.JSON_COLUMNS:
+            job[column] = json.loads(job[column]) if job[column] is not None else None
+        return job
+
+    def update(self, job_id, **fields):
+        fields = dict(fields)
+        for column in self.JSON_COLUMNS:
+            if column in fields and fields[column] is not None:
+                fields[column] = json.dumps(fields[column])
+        assignments = ", ".join(f"{column} = :{column}" for column in fields)
+        with self._connect() as db:
+            db.execute(f"UPDATE jobs SET {assignments} WHERE id = :id", dict(fields, id=job_id))
+
+    def claim(self, job_id, started_at, owner, lease_until):
+        """
+        Mark a queued job as running, leased to owner until lease_until.
+        Returns False if it is not queued.
+        """
+        with self._connect() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET status = ?, started_at = ?, owner = ?, lease_until = ? "
+                "WHERE id = ? AND status = ?",
+                (RUNNING, started_at, owner, lease_until, job_id, QUEUED)
+            )
+        return cursor.rowcount == 1
+
+    def renew(self, owner, lease_until):
+        """
+        Extend the lease of the queued and running jobs of owner to
+        lease_until
+        """
+        with self._connect() as db:
+            db.execute("UPDATE jobs SET lease_until = ? WHERE owner = ? AND status IN (?, ?)",
+                       (lease_until, owner, QUEUED, RUNNING))
+
+    def release(self, owner):
+        """
+        End the lease of the queued jobs of owner, so others take them over
+        right away
+        """
+        with self._connect() as db:
+            db.execute("UPDATE jobs SET lease_until = NULL WHERE owner = ? AND status = ?", (owner, QUEUED))
+
+    def take_expired(self, now, owner, lease_until):
+        """
+        Lease the queued and running jobs whose lease expired before now
+        (their process stopped or crashed) to owner until lease_until,
+        marking them as queued, and return their ids, oldest first
+        """
+        expired = "status IN (?, ?) AND (lease_until IS NULL OR lease_until < ?)"
+        with self._connect() as db:
+            # One write transaction: processes taking jobs over at the same
+            # time never get the same job
+            db.execute("BEGIN IMMEDIATE")
+            rows = db.execute(f"SELECT id FROM jobs WHERE {expired} ORDER BY created_at",
+                              (QUEUED, RUNNING, now)).fetchall()
+            db.execute(
+                f"UPDATE jobs SET status = ?, started_at = NULL, owner = ?, lease_until = ? WHERE {expired}",
+                (QUEUED, owner, lease_until, QUEUED, RUNNING, now)
+            )
+        return [row["id"] for row in rows]
+
+    def purge(self, finished_before):
+        with self._connect() as db:
+            db.execute("DELETE FROM jobs WHERE finished_at < ?", (finished_before,))
+
+
+def send_callback(url, payload, attempts=CALLBACK_ATTEMPTS, timeout=CALLBACK_TIMEOUT):
+    """
+    POST payload as JSON to a webhook URL, retrying with backoff.
+    Returns True once the webhook answers with a 2xx status.
+    """
+    # Imported here: most jobs have no callback
+    import urllib.request
+
+    body = json.dumps(payload).encode("utf-8")
+
+    for attempt in range(attempts):
+        request = urllib.request.Request(url, data=body, method="POST",
+                                         headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                if 200 <= response.status < 300:
+                    return True
+        except Exception as e:
+            print(f"Error calling job webhook {url}: {e}")
+        if attempt + 1 < attempts:
+            time.sleep(2 ** attempt)
+
+    return False
+
+
+class JobQueue:
+    """
+    In-process queue running extraction jobs in the background.
+
+    Jobs are kept in a store (SqliteJobStore or MemoryJobStore) and their
+    ids in a queue read by dispatcher threads, which run the handler
+    registered for the job kind. Handlers get the job params and return a
+    JSON-serializable result.
+
+    A queued or running job is leased to this queue (its owner id) for
+    lease seconds, renewed by a heartbeat thread. On start and on every
+    heartbeat, queued and running jobs whose lease expired (their process
+    stopped or crashed) are taken over and queued here; jobs of other live
+    processes sharing the store are left alone.
+    """
+
+    def __init__(self, store, threads=JOB_THREADS, retention=JOB_RETENTION, lease=JOB_LEASE):
+        self.store = store
+        self.threads = threads
+        self.retention = retention
+        self.lease = lease
+        self.owner = uuid.uuid4().hex
+        self.handlers = {}
+        self._queue = queue.Queue()
+        self._threads = []
+        self._stopped = threading.Event()
+
+    def register(self, kind, handler):
+        self.handlers[kind] = handler
+
+    def submit(self, kind, params, callback_url=None):
+        """
+        Store a new job and queue it. Returns the job.
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+
+        now = time.time()
+        job = {
+            "id": uuid.uuid4().hex,
+            "kind": kind,
+            "status": QUEUED,
+            "params": params,
+            "result": None,
+            "error": None,
+            "callback_url": callback_url,
+            "created_at": now,
+            "started_at": None,
+            "finished_at": None,
+            # Leased while queued too, so others take it over if we stop
+            "owner": self.owner,
+            "lease_until": now + self.lease,
+        }
+        self.store.create(job)
+        self._queue.put(job["id"])
+        return job
+
+    def get(self, job_id):
+        return self.store.get(job_id)
+
+    def depth(self):
+        """
+        Number of jobs waiting for a dispatcher thread
+        """
+        return self._queue.qsize()
+
+    def _run(self, job_id):
+        now = time.time()
+        if not self.store.claim(job_id, now, self.owner, now + self.lease):
+            return
+        job = self.store.get(job_id)
+
+        fields = {"status": SUCCEEDED, "result": None, "error": None}
+        while True:
+            try:
+                fields["result"] = self.handlers[job["kind"]](job["params"])
+            except QueueFullError:
+                # The worker pool is busy with requests; wait for a free slot
+                time.sleep(1)
+                continue
+            except Exception as e:
+                fields["status"] = FAILED
+                # HTTPException keeps its message in detail
+                fields["error"] = str(getattr(e, "detail", None) or e)
+            break
+
+        fields["finished_at"] = time.time()
+        self.store.update(job_id, lease_until=None, **fields)
+
+        if job["callback_url"]:
+            payload = dict(job, **fields)
+            # The lease is internal to the job store
+            del payload["owner"], payload["lease_until"]
+            send_callback(job["callback_url"], payload)
+
+        self.store.purge(time.time() - self.retention)
+
+    def _dispatch(self):
+        while True:
+            job_id = self._queue.get()
+            if job_id is None:
+                return
+            try:
+                self._run(job_id)
+            except Exception as e:
+                print(f"Error running job {job_id}: {e}")
+
+    def _take_expired(self):
+        """
+        Queue here the jobs of processes that stopped renewing their leases
+        """
+        now = time.time()
+        for job_id in self.store.take_expired(now, self.owner, now + self.lease):
+            self._queue.put(job_id)
+
+    def _heartbeat(self):
+        # Renew the leases of this queue's jobs well before they expire, and
+        # take over the jobs of processes that stopped renewing theirs
+        while not self._stopped.wait(self.lease / 3):
+            try:
+                self.store.renew(self.owner, time.time() + self.lease)
+                self._take_expired()
+            except Exception as e:
+                print(f"Error renewing job leases: {e}")
+
+    def start(self):
+        """
+        Queue the jobs left unfinished by a previous run and start the
+        dispatcher and heartbeat threads
+        """
+        if self._threads:
+            return
+
+        self._stopped.clear()
+        self.store.purge(time.time() - self.retention)
+        self._take_expired()
+
+        for index in range(max(self.threads, 1)):
+            thread = threading.Thread(target=self._dispatch, name=f"job-dispatcher-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        heartbeat = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+        heartbeat.start()
+
+    def stop(self):
+        """
+        Stop the dispatcher threads once their current jobs are done; jobs
+        still queued are released to the next process to start or heartbeat
+        """
+        self._stopped.set()
+        try:
+            self.store.release(self.owner)
+        except Exception as e:
+            print(f"Error releasing queued jobs: {e}")
+        # Drop queued ids so the threads see the stop markers right away
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+        for _ in self._threads:
+            self._queue.put(None)
+        self._threads = []
+
+
+def make_job_store(path=JOBS_DB):
+    """
+    SqliteJobStore at path, or a MemoryJobStore when path is empty
+    """
+    return SqliteJobStore(path) if path else MemoryJobStore()
+
+
+# Shared job queue used by the routes
+job_queue = JobQueue(make_job_store())
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+import asyncio
+import os
+import threading
+import time
+
+import anyio
+from fastapi import HTTPException
+
+from utils.executor import WORKERS, current_cancel
+
+
+# Requests of one endpoint processed at once; more wait, without holding a
+# thread, for a free slot. ENDPOINT_CONCURRENCY_<ENDPOINT> overrides it for
+# one endpoint, e.g. ENDPOINT_CONCURRENCY_EXTRACT_IMAGES=2. Each endpoint
+# runs on threads of its own (see EndpointLimiter), so the sum over the
+# endpoints is not bounded by anyio's default thread limit.
+ENDPOINT_CONCURRENCY = int(os.environ.get("ENDPOINT_CONCURRENCY", str(max(WORKERS, 1) * 2)))
+
+# Seconds a request may wait and run before it fails with 504 (0 never times
+# out); REQUEST_TIMEOUT_<ENDPOINT> overrides it for one endpoint
+REQUEST_TIMEOUT = float(os.environ.get("REQUEST_TIMEOUT", "120"))
+
+# Seconds between two checks for a disconnected client
+DISCONNECT_POLL_INTERVAL = 0.25
+
+# Returned by next() on the threadpool once a stream is exhausted
+STREAM_END = object()
+
+
+def get_endpoint_setting(setting, endpoint, default):
+    """
+    Value of the <setting>_<ENDPOINT> environment variable, or default
+    """
+    value = os.environ.get(f"{setting}_{endpoint.upper()}")
+    return type(default)(value) if value else default
+
+
+class RequestAborted(HTTPException):
+    """
+    Raised when a request is given up before its work is done
+    """
+
+
+class RequestTimeoutError(RequestAborted):
+    def __init__(self, timeout):
+        super().__init__(status_code=504, detail=f"Request did not complete within {timeout:g} seconds")
+
+
+class ClientDisconnectedError(RequestAborted):
+    def __init__(self):
+        # 499 (client closed request); nobody is left to read it
+        super().__init__(status_code=499, detail="Client disconnected")
+
+
+def discard_result(task):
+    """
+    Done callback of a task nobody awaits any more
+    """
+    if not task.cancelled():
+        task.exception()
+
+
+class EndpointLimiter:
+    """
+    Runs the blocking work of one endpoint's requests on the threadpool, at
+    most concurrency requests at a time.
+
+    Requests over the limit wait on a semaphore rather than in a thread.
+    Admitted requests run on a thread capacity limiter of their own, sized
+    to concurrency, instead of anyio's default limiter (40 threads shared
+    by the rest of the app), so a burst of slow requests to one endpoint
+    cannot hold the threads other endpoints need. Invariant: an endpoint
+    never has more than concurrency threads at once, counting the threads
+    of given-up requests until they finish, since those keep their slot. A request still waiting or running after timeout
+    seconds fails with RequestTimeoutError, and one whose client went away
+    with ClientDisconnectedError. Either way the work is told to stop
+    through current_cancel: PDF tasks it has not started yet are dropped
+    (see PdfExecutor.run).
+    """
+
+    def __init__(self, name, concurrency=ENDPOINT_CONCURRENCY, timeout=REQUEST_TIMEOUT):
+        self.name = name
+        self.concurrency = get_endpoint_setting("ENDPOINT_CONCURRENCY", name, concurrency)
+        self.timeout = get_endpoint_setting("REQUEST_TIMEOUT", name, float(timeout))
+        self.active = 0
+        self.waiting = 0
+        # Created on first use, inside the server's event loop
+        self._semaphore = None
+        self._threads = None
+
+    def _get_semaphore(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._semaphore
+
+    async def _run_thread(self, fn):
+        """
+        Run fn() on one of this endpoint's threads
+        """
+        if self._threads is None:
+            self._threads = anyio.CapacityLimiter(self.concurrency)
+        return await anyio.to_thread.run_sync(fn, limiter=self._threads)
+
+    def _get_deadline(self):
+        return time.monotonic() + self.timeout if self.timeout else None
+
+    async def _wait(self, task, request, deadline):
+        """
+        Result of task, raising once request disconnects or deadline passes
+        """
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_INTERVAL)
+            if done:
+                return task.result()
+            if request is not None and await request.is_disconnected():
+                raise ClientDisconnectedError()
+            if deadline is not None and time.monotonic() > deadline:
+                raise RequestTimeoutError(self.timeout)
+
+    async def _work(self, cancel, fn, args, kwargs):
+        def call():
+            current_cancel.set(cancel)
+            return fn(*args, **kwargs)
+
+        semaphore = self._get_semaphore()
+        self.waiting += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        if cancel.is_set():
+            semaphore.release()
+            return None
+
+        self.active += 1
+        try:
+            return await self._run_thread(call)
+        finally:
+            self.active -= 1
+            semaphore.release()
+
+    async def run(self, request, fn, *args, **kwargs):
+        """
+        Run fn(*args, **kwargs) on the threadpool for request (a starlette
+        Request, watched for disconnection) and return its result
+        """
+        cancel = threading.Event()
+        task = asyncio.ensure_future(self._work(cancel, fn, args, kwargs))
+
+        try:
+            return await self._wait(task, request, self._get_deadline())
+        finally:
+            if not task.done():
+                # A running thread cannot be interrupted: it sees the event
+                # and stops at its next PDF task, and the task frees the
+                # slot once the thread is done
+                cancel.set()
+                task.add_done_callback(discard_result)
+
+    async def stream(self, records):
+        """
+        Async iterator over records, an iterator (e.g. a generator) doing
+        blocking work, advanced on the threadpool.
+
+        The stream holds one slot from before its first record until its
+        last, and the timeout covers the whole stream: past it the stream
+        ends with RequestTimeoutError. Disconnected clients are left to the
+        streaming response, which stops iterating. A stream stopped early
+        tells records to stop through current_cancel and closes it before
+        its slot is released.
+        """
+        semaphore = self._get_semaphore()
+        cancel = threading.Event()
+        deadline = self._get_deadline()
+
+        def next_record():
+            current_cancel.set(cancel)
+            return next(records, STREAM_END)
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(semaphore.acquire(), self.timeout or None)
+        except asyncio.TimeoutError:
+            raise RequestTimeoutError(self.timeout)
+        finally:
+            self.waiting -= 1
+
+        self.active += 1
+        task = None
+        try:
+            while True:
+                task = asyncio.ensure_future(self._run_thread(next_record))
+                record = await self._wait(task, None, deadline)
+                if record is STREAM_END:
+                    return
+                yield record
+        finally:
+            cancel.set()
+            closing = asyncio.ensure_future(self._close_stream(records, task, semaphore))
+            closing.add_done_callback(discard_result)
+
+    async def _close_stream(self, records, task, semaphore):
+        """
+        Close a stream's records once its last thread is done, then free
+        its slot
+        """
+        try:
+            if task is not None and not task.done():
+                task.add_done_callback(discard_result)
+                await asyncio.wait({task})
+            close = getattr(records, "close", None)
+            if close is not None:
+                # Closing runs the generator's cleanup, which may wait for
+                # work in flight
+                await self._run_thread(close)
+        finally:
+            self.active -= 1
+            semaphore.release()
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+# Add a Server-Timing header with the stage timings to API responses
+SERVER_TIMING = os.environ.get("SERVER_TIMING", "0") == "1"
+
+# Histogram buckets, in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def format_labels(names, values, extra=""):
+    labels = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        labels.append(extra)
+    return "{" + ",".join(labels) + "}" if labels else ""
+
+
+class Histogram:
+    """
+    Prometheus-style histogram with optional labels
+    """
+
+    def __init__(self, name, help, label_names=(), buckets=BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+        self.buckets = buckets
+        self.series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self.series.get(labels)
+            if series is None:
+                # Per-bucket counts, then sum and count
+                series = self.series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][index] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, (counts, total, count) in sorted(self.series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    le = format_labels(self.label_names, labels, f'le="{bound}"')
+                    lines.append(f"{self.name}_bucket{le} {cumulative}")
+                le = format_labels(self.label_names, labels, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{le} {count}")
+                lines.append(f"{self.name}_sum{format_labels(self.label_names, labels)} {total}")
+                lines.append(f"{self.name}_count{format_labels(self.label_names, labels)} {count}")
+        return lines
+
+
+class Counter:
+    """
+    Prometheus-style counter with optional labels
+    """
+
+    def __init__(self, name, help, label_names=()):
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+        self.series = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self.series[labels] = self.series.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self.series.items()):
+                lines.append(f"{self.name}{format_labels(self.label_names, labels)} {value}")
+        return lines
+
+
+class Gauge:
+    """
+    Prometheus-style gauge (or counter kept elsewhere) whose value is read
+    from a function when rendered. With label_names, read returns a dict
+    mapping label value tuples to values.
+    """
+
+    def __init__(self, name, help, read, kind="gauge", label_names=()):
+        self.name = name
+        self.help = help
+        self.read = read
+        self.kind = kind
+        self.label_names = label_names
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        if not self.label_names:
+            lines.append(f"{self.name} {self.read()}")
+            return lines
+        for labels, value in sorted(self.read().items()):
+            lines.append(f"{self.name}{format_labels(self.label_names, labels)} {value}")
+        return lines
+
+
+STAGE_SECONDS = Histogram("pdf_stage_seconds", "Time spent in each PDF processing stage", ("stage",))
+REQUEST_SECONDS = Histogram("http_request_duration_seconds", "HTTP request latency", ("endpoint",))
+REQUESTS = Counter("http_requests_total", "HTTP requests by endpoint and status", ("endpoint", "status"))
+
+# Metrics rendered by /metrics, in order
+METRICS = [STAGE_SECONDS, REQUEST_SECONDS, REQUESTS]
+
+# HTTP requests being served
+in_flight = 0
+_in_flight_lock = threading.Lock()
+
+# Stage timings of the current request, for the Server-Timing header
+request_timings = contextvars.ContextVar("request_timings", default=None)
+
+# Stage timings of the task running in this worker process (see timed_call)
+_task_timings = None
+_task_lock = threading.Lock()
+
+
+def register_gauge(name, help, read, kind="gauge", label_names=()):
+    """
+    Add a metric read from read() whenever /metrics is rendered
+    """
+    METRICS.append(Gauge(name, help, read, kind, label_names))
+
+
+def record_stage(stage, seconds):
+    """
+    Record the time spent in a stage.
+
+    Inside a worker process task the timing is kept for the process that
+    submitted the task; otherwise it goes to the histogram and to the
+    current request's Server-Timing.
+    """
+    if _task_timings is not None:
+        with _task_lock:
+            _task_timings.append((stage, seconds))
+        return
+
+    STAGE_SECONDS.observe(seconds, stage)
+    timings = request_timings.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+
+
+@contextmanager
+def span(stage):
+    """
+    Time the body of a with statement as stage
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
+
+
+def timed_call(fn, args, kwargs, submitted_at):
+    """
+    Run fn(*args, **kwargs) in a worker process and return (result,
+    timings), timings being the stages recorded while it ran plus the time
+    it waited in the pool queue.
+    """
+    global _task_timings
+
+    _task_timings = [("queue", max(time.time() - submitted_at, 0.0))]
+    try:
+        result = fn(*args, **kwargs)
+        return result, _task_timings
+    finally:
+        _task_timings = None
+
+
+def render_metrics():
+    """
+    All metrics in the Prometheus text exposition format
+    """
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def format_server_timing(timings):
+    """
+    Server-Timing header value summing the timings of each stage
+    """
+    totals = {}
+    for stage, seconds in timings:
+        totals[stage] = totals.get(stage, 0.0) + seconds
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in totals.items())
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware counting requests in flight, timing every request by
+    endpoint and, with SERVER_TIMING set, adding the stage timings of the
+    request in a Server-Timing header
+    """
+
+    def __init__(self, app, server_timing=SERVER_TIMING):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        global in_flight
+
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = []
+        token = request_timings.set(timings)
+        start = time.perf_counter()
+        status = [500]
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                if self.server_timing:
+                    timings.append(("app", time.perf_counter() - start))
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", format_server_timing(timings).encode("latin-1")))
+                    message = dict(message, headers=headers)
+            await send(message)
+
+        with _in_flight_lock:
+            in_flight += 1
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            with _in_flight_lock:
+                in_flight -= 1
+            request_timings.reset(token)
+
+            # The router stores the matched endpoint in the scope
+            endpoint = getattr(scope.get("endpoint"), "__name__", "other")
+            REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint)
+            REQUESTS.inc(endpoint, str(status[0]))
+
+
+register_gauge("http_requests_in_flight", "HTTP requests being served", lambda: in_flight)
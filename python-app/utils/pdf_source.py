@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+import fitz
+
+from utils.metrics import span
+
+
+def open_pdf(source):
+    """
+    Open a PDF given either as a file path or as the bytes of the file.
+
+    Bytes are opened in memory, so uploaded PDFs never touch the disk.
+    """
+    with span("open"):
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            return fitz.open(stream=source, filetype="pdf")
+        return fitz.open(source)
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from utils.static_store import StaticStore
+
+
+# Memory budget of the in-process tier, in bytes of serialized JSON
+MAX_BYTES = int(os.environ.get("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Directory of the optional on-disk tier (empty disables it), e.g.
+# /app/cache/results. Entries hold patient details: keep it out of the
+# directory served at /static.
+DISK_DIR = os.environ.get("RESULT_CACHE_DIR", "")
+
+# Disk budget of the on-disk tier; the least recently used entries go
+# first (0 is unbounded)
+DISK_MAX_BYTES = int(os.environ.get("RESULT_CACHE_DISK_MAX_BYTES", str(256 * 1024 * 1024)))
+
+
+def file_digest(file_path, chunk_size=1024 * 1024):
+    """
+    SHA-256 hex digest of a file's contents
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_digest(source):
+    """
+    SHA-256 hex digest of a PDF given as a file path or as its bytes
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return hashlib.sha256(source).hexdigest()
+    return file_digest(source)
+
+
+def make_key(digest, kind, version):
+    """
+    Cache key for the output of extractor kind (at version) on a PDF digest
+    """
+    return f"{kind}-{version}-{digest}"
+
+
+class ResultCache:
+    """
+    Two-tier cache of JSON-serializable extraction results.
+
+    The memory tier is an LRU bounded by the total size of the serialized
+    values. The optional disk tier keeps one JSON file per key and is
+    consulted on memory misses, so results survive restarts and are shared
+    between uvicorn workers. Its files are swept like the image store (see
+    StaticStore), reads refreshing them, to stay within disk_max_bytes.
+    """
+
+    def __init__(self, max_bytes=MAX_BYTES, disk_dir=DISK_DIR, disk_max_bytes=DISK_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_store = None
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            disk_dir = os.path.abspath(self.disk_dir)
+            self.disk_store = StaticStore(os.path.dirname(disk_dir), os.path.basename(disk_dir),
+                                          max_age=0, max_bytes=disk_max_bytes)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _store(self, key, data):
+        # Caller holds the lock
+        if key in self.entries:
+            self.size -= len(self.entries.pop(key))
+
+        if len(data) > self.max_bytes:
+            return
+
+        self.entries[key] = data
+        self.size += len(data)
+
+        # Evict least recently used entries until we fit the budget
+        while self.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    def get(self, key):
+        """
+        Return a fresh copy of the cached value, or None on a miss
+        """
+        with self._lock:
+            data = self.entries.get(key)
+            if data is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return json.loads(data)
+
+        if self.disk_dir:
+            try:
+                with open(self._disk_path(key), "r", encoding="utf-8") as f:
+                    data = f.read()
+                value = json.loads(data)
+                # Mark the entry as recently used for the sweeper
+                os.utime(self._disk_path(key))
+            except (OSError, ValueError):
+                pass
+            else:
+                with self._lock:
+                    self._store(key, data)
+                    self.hits += 1
+                    self.disk_hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, value):
+        data = json.dumps(value)
+
+        with self._lock:
+            self._store(key, data)
+
+        if self.disk_dir:
+            # Write atomically so concurrent readers never see partial files
+            path = self._disk_path(key)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                print(f"Error writing result cache entry {key}: {e}")
+
+    def delete(self, key):
+        with self._lock:
+            if key in self.entries:
+                self.size -= len(self.entries.pop(key))
+
+        if self.disk_dir:
+            try:
+                os.remove(self._disk_path(key))
+            except OSError:
+                pass
+
+    def start_sweeper(self):
+        """
+        Keep the disk tier within its budget on a background thread
+        """
+        if self.disk_store is not None:
+            self.disk_store.start_sweeper()
+
+    def stop_sweeper(self):
+        if self.disk_store is not None:
+            self.disk_store.stop_sweeper()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "entries": len(self.entries),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+                "disk_dir": self.disk_dir or None,
+            }
+
+
+# Shared cache used by the routes
+result_cache = ResultCache()
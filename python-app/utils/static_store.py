@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+import hashlib
+import os
+import threading
+import time
+
+from utils.metrics import span
+
+
+# Directory served at /static; stored files are named relative to it
+STATIC_DIR = "/app/static"
+
+# Remove stored files not written or reused for this many seconds (0 keeps them)
+MAX_AGE = int(os.environ.get("STATIC_STORE_MAX_AGE", str(24 * 60 * 60)))
+
+# Disk budget of the store; the least recently used files go first (0 is unbounded)
+MAX_BYTES = int(os.environ.get("STATIC_STORE_MAX_BYTES", str(1024 * 1024 * 1024)))
+
+# Temporary files of writes in progress are left alone for this many seconds;
+# older ones were left behind by a crashed write and are removed
+TMP_GRACE = int(os.environ.get("STATIC_STORE_TMP_GRACE", str(60 * 60)))
+
+# Seconds between two background sweeps
+SWEEP_INTERVAL = int(os.environ.get("STATIC_STORE_SWEEP_INTERVAL", "300"))
+
+
+class StaticStore:
+    """
+    Content-addressed store for files served under /static.
+
+    Every file is named by the SHA-256 of its contents, so identical images
+    are written once however many extractions produce them. Writing or
+    reusing a file refreshes its modification time, which the sweeper uses
+    to drop files older than max_age and then the least recently used ones
+    until the store fits in max_bytes.
+    """
+
+    def __init__(self, static_dir=STATIC_DIR, name="store", max_age=MAX_AGE,
+                 max_bytes=MAX_BYTES, sweep_interval=SWEEP_INTERVAL, tmp_grace=TMP_GRACE):
+        self.static_dir = static_dir
+        self.name = name
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self.tmp_grace = tmp_grace
+        self.files = 0
+        self.size = 0
+        self.removed = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def root(self):
+        return os.path.join(self.static_dir, self.name)
+
+    def path(self, name):
+        """
+        Absolute path of a stored file name returned by put
+        """
+        return os.path.join(self.static_dir, name)
+
+    def url(self, name):
+        return f"/static/{name}"
+
+    def put(self, data, extension):
+        """
+        Store data and return its name relative to the static directory.
+
+        Files are spread over 256 subdirectories by the first two hex
+        digits of their digest.
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        name = f"{self.name}/{digest[:2]}/{digest}.{extension}"
+        path = self.path(name)
+
+        if self.touch([name]):
+            return name
+
+        # Write atomically so concurrent readers never see partial files
+        with span("write"):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+        return name
+
+    def touch(self, names):
+        """
+        Mark stored files as used. Returns False if any of them is gone.
+        """
+        for name in names:
+            try:
+                os.utime(self.path(name))
+            except OSError:
+                return False
+        return True
+
+    def sweep(self):
+        """
+        Remove expired files, then the least recently used ones until the
+        store fits its budget. Returns the number of files removed.
+
+        Temporary files of writes in progress are neither counted nor
+        removed, so put can still move them in place.
+        """
+        now = time.time()
+        entries = []
+        removed = 0
+
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                if filename.endswith(".tmp"):
+                    if now - stat.st_mtime > self.tmp_grace:
+                        try:
+                            os.remove(path)
+                        except OSError:
+                            pass
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        # Oldest first
+        entries.sort()
+        size = sum(entry[1] for entry in entries)
+        kept = len(entries)
+
+        for mtime, file_size, path in entries:
+            expired = self.max_age and now - mtime > self.max_age
+            over_budget = self.max_bytes and size > self.max_bytes
+            if not expired and not over_budget:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            size -= file_size
+            kept -= 1
+            removed += 1
+
+        self.files = kept
+        self.size = size
+        self.removed += removed
+        return removed
+
+    def _run_sweeper(self):
+        while True:
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"Error sweeping {self.root}: {e}")
+            if self._stop.wait(self.sweep_interval):
+                return
+
+    def start_sweeper(self):
+        """
+        Sweep now and then every sweep_interval seconds on a daemon thread
+        """
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run_sweeper, name=f"{self.name}-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop_sweeper(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+
+# Shared store used by the routes
+static_store = StaticStore()
@@ -1,153 +1,525 @@
 #!/usr/bin/env python3
-import fitz
 import re
 import json
 import sys
+from itertools import islice
 
+from utils.metrics import span
+from utils.pdf_source import open_pdf
 
-def convert_pdf_to_txt(file_path):
-    doc = fitz.open(file_path)  # open document
-    output_txt = b""  # initialize as bytes
-    
-    for page in doc:  # iterate the document pages
-        # get plain text and encode to UTF-8 bytes
-        page_text = page.get_text().encode("utf8")
-        output_txt += page_text
-        # Add a page delimiter
-        output_txt += bytes((12,))  # form feed character as page delimiter
+# Bump whenever get_text_from_pdf output changes, to invalidate cached results
+TEXT_EXTRACTOR_VERSION = "3"
+
+
+# Page delimiter appended after the text of every page
+PAGE_DELIMITER = "\f"  # form feed character
+
+
+def iter_page_text(doc, max_pages=None):
+    """
+    Lazily yield the text of each page of an open fitz document (up to
+    max_pages pages), followed by a page delimiter
+    """
+    for page in islice(doc, max_pages):  # iterate the document pages
+        yield page.get_text()
+        yield PAGE_DELIMITER
+
+
+@span("text")
+def get_document_str(doc, max_pages=None):
+    """
+    Text of every page of an open fitz document (up to max_pages pages) as a
+    single str, joined once
+    """
+    return "".join(iter_page_text(doc, max_pages))
+
+
+def convert_pdf_to_str(file_path):
+    doc = open_pdf(file_path)  # open document
+    output_txt = get_document_str(doc)
+    doc.close()
     
     return output_txt
 
 
+def convert_pdf_to_txt(file_path):
+    """
+    UTF-8 bytes version of convert_pdf_to_str, kept for compatibility
+    """
+    return convert_pdf_to_str(file_path).encode("utf8")
+
+
+# Fields reported by get_text_from_pdf, in output order
+PATIENT_FIELDS = (
+    "Patient",
+    "Date of Birth",
+    "Gender",
+    "Patient ID",
+    "Office Location",
+    "Test Type",
+    "Created",
+    "Fixation Monitor",
+    "Fixation Target",
+    "Fixation Losses",
+    "False POS Errors",
+    "False NEG Errors",
+    "Test Duration",
+    "Fovea",
+    "Stimulus",
+    "Background",
+    "Strategy",
+    "Pupil Diameter",
+    "Visual Acuity",
+    "Rx",
+    "Date",
+    "Time",
+    "Age",
+    # Additional fields that might be present in PDFs
+    "Eye",
+    "Grid",
+    "MD10-2",
+    "PSD10-2",
+    "SF",
+    "CPSD",
+    # Other possible visual field metrics
+    "MD",
+    "PSD",
+    "VFI",
+    "GHT",
+)
+
+# Fields a report must have for its extraction to count as complete
+CRITICAL_FIELDS = ("Patient", "Patient ID", "Date of Birth", "Test Type")
+
+# Patterns are compiled once at import instead of on every line
+DATE_PATTERN = re.compile(r"/\d+/")
+
+ADDRESS_PATTERN = re.compile(
+    r"[0-9]+[ |[a-zà-ú.,-]* ((highway)|(autoroute)|(north)|"
+    r"(nord)|(south)|(sud)|(east)|(est)|(west)|(ouest)|(avenue)|"
+    r"(lane)|(voie)|(ruelle)|(road)|(rue)|(route)|(drive)|"
+    r"(boulevard)|(circle)|(cercle)|(street)|(cer\.)|(cir\.)|"
+    r"(blvd\.)|(hway\.)|(st\.)|(aut\.)|(ave\.)|(ln\.)|(rd\.)|"
+    r"(hw\.)|(dr\.)|(a\.))([ .,-]*[a-zà-ú0-9]*)*",
+    re.IGNORECASE
+)
+
+# An address always starts with a house number
+ADDRESS_START = frozenset("0123456789")
+
+EYE_AND_TEST_PATTERN = re.compile("(^|OS|OD).+(Test|$)")
+
+DB_VALUE_PATTERN = re.compile("(.*?)dB")
+
+# Visual field metrics scanned for on non-label lines, in scan order
+METRIC_PATTERNS = tuple(
+    (metric, re.compile(r'{}[:\s]*([-+]?\d+\.\d+)\s*dB'.format(metric), re.IGNORECASE))
+    for metric in ["MD", "PSD", "VFI", "SF", "CPSD", "MD10-2", "PSD10-2"]
+)
+
+
 def get_text_from_pdf(lines):
-    patient_details = {
-        "Patient": None,
-        "Date of Birth": None,
-        "Gender": None,
-        "Patient ID": None,
-        "Office Location": None,
-        "Test Type": None,
-        "Created": None,
-        "Fixation Monitor": None,
-        "Fixation Target": None,
-        "Fixation Losses": None,
-        "False POS Errors": None,
-        "False NEG Errors": None,
-        "Test Duration": None,
-        "Fovea": None,
-        "Stimulus": None,
-        "Background": None,
-        "Strategy": None,
-        "Pupil Diameter": None,
-        "Visual Acuity": None,
-        "Rx": None,
-        "Date": None,
-        "Time": None,
-        "Age": None,
-        # Additional fields that might be present in PDFs
-        "Eye": None,
-        "Grid": None,
-        "MD10-2": None,
-        "PSD10-2": None,
-        "SF": None,
-        "CPSD": None,
-        # Other possible visual field metrics
-        "MD": None,
-        "PSD": None,
-        "VFI": None,
-        "GHT": None,
-    }
+    """
+    Parse patient details out of the text of a visual field report.
+    
+    Returns "[(1)]" or "[(0)]" (whether a Patient ID was found) followed by
+    the details as JSON.
+    """
+    return format_text_result(parse_patient_details(lines))
+
+
+def format_text_result(patient_details):
+    """
+    Format parsed patient details as a get_text_from_pdf result string
+    """
+    if patient_details["Patient ID"]:
+        response = "[(1)]" + json.dumps(patient_details)
+    else:
+        response = "[(0)]" + json.dumps(patient_details)
+    return response
+
+
+@span("parse")
+def parse_patient_details(lines):
+    """
+    Parse the text of a visual field report into a dict of PATIENT_FIELDS.
+    
+    lines is the text returned by convert_pdf_to_str (or the UTF-8 bytes from
+    convert_pdf_to_txt). Every line is visited once and dispatched on its
+    shape: "Label: value" lines, label blocks whose values follow on later
+    lines, and free-text lines that may hold the office address or a metric
+    in dB.
+    """
+    patient_details = dict.fromkeys(PATIENT_FIELDS)
     emptyString = ""
 
-    lines = lines.decode("utf-8")
+    if isinstance(lines, bytes):
+        lines = lines.decode("utf-8")
     lines = lines.splitlines()
-    # print(lines)
+    line_count = len(lines)
+
     i = 0
-    while i < len(lines):
-        if ":" in lines[i]:
-            newData = lines[i].split(":", 1)
-            if newData[1].strip() != emptyString:
-                if newData[0] in patient_details.keys():
-                    if not re.search("/\d+/", newData[0]):
-                        answer = newData[1].replace(",", "")
-                        answer = answer.strip()
-                        patient_details[newData[0]] = answer
+    while i < line_count:
+        line = lines[i]
+        if ":" in line:
+            label, value = line.split(":", 1)
+            if value.strip() != emptyString:
+                if label in patient_details:
+                    if not DATE_PATTERN.search(label):
+                        patient_details[label] = value.replace(",", "").strip()
+                i = i + 1
+            elif i + 1 == line_count:
+                # A label on the last line has no value
                 i = i + 1
             else:
-                tempArray = []
-                if lines[i + 1].strip()[len(lines[i + 1].strip()) - 1] == ":":
-                    while True:
-                        nextData = lines[i].split(":")
-                        tempArray.append(nextData[0])
+                next_line = lines[i + 1].strip()
+                if next_line.endswith(":"):
+                    # A block of labels whose values follow the block
+                    tempArray = []
+                    while i < line_count:
+                        tempArray.append(lines[i].split(":")[0])
                         i = i + 1
-                        if lines[i][len(lines[i].strip()) - 1] != ":":
+                        if i == line_count or not lines[i].strip().endswith(":"):
                             break
 
                     for data in tempArray:
-                        if data in patient_details.keys():
-                            if not re.search("/\d+/", data):
+                        if i == line_count:
+                            # The page ends before the values
+                            break
+                        if data in patient_details:
+                            if not DATE_PATTERN.search(data):
                                 if data == "Pupil Diameter":
                                     if "mm" in lines[i]:
-                                        answer = lines[i].replace(",", "")
-                                        answer = answer.strip()
-                                        patient_details[data] = answer
+                                        patient_details[data] = lines[i].replace(",", "").strip()
                                         i = i + 1
                                 else:
-                                    answer = lines[i].replace(",", "")
-                                    answer = answer.strip()
-                                    patient_details[data] = answer
+                                    patient_details[data] = lines[i].replace(",", "").strip()
                                     i = i + 1
-                    tempArray.clear()
                 else:
-                    if "dB" in lines[i+1]:
-                        answer = str(re.match("(.*?)dB", lines[i + 1]).group())
-                    else:
-                        answer = lines[i+1]
-                    answer = answer.replace(",", "")
-                    answer = answer.strip()
-                    patient_details[newData[0]] = answer
+                    patient_details[label] = clean_value(lines[i + 1], trim_db=True)
                     i = i + 1
         else:
-            pattern = "[0-9]+[ |[a-zà-ú.,-]* ((highway)|(autoroute)|(north)|" \
-                    "(nord)|(south)|(sud)|(east)|(est)|(west)|(ouest)|(avenue)|" \
-                    "(lane)|(voie)|(ruelle)|(road)|(rue)|(route)|(drive)|" \
-                    "(boulevard)|(circle)|(cercle)|(street)|(cer\.)|(cir\.)|" \
-                    "(blvd\.)|(hway\.)|(st\.)|(aut\.)|(ave\.)|(ln\.)|(rd\.)|" \
-                    "(hw\.)|(dr\.)|(a\.))([ .,-]*[a-zà-ú0-9]*)*"
-            match = re.match(pattern, lines[i], re.IGNORECASE)
-            if match:
-                patient_details["Office Location"] = match.group()
-                tempString = lines[i+1]+" "+lines[i+2]+" "+lines[i+3]
-                if(re.match("(^|OS|OD).+(Test|$)",tempString)):
-                    tempEyeAndGridArray = tempString.split("Single Field Analysis")
-                    patient_details["Eye"] = tempEyeAndGridArray[0].strip()
-                    patient_details["Test Type"] = tempEyeAndGridArray[1].strip()
-                    patient_details["Grid"] = tempEyeAndGridArray[1].strip().split(" ")[1].strip()
+            if line[:1] in ADDRESS_START:
+                match = ADDRESS_PATTERN.match(line)
+                if match:
+                    patient_details["Office Location"] = match.group()
+                    # Fewer than three lines left leave the eye and test type empty
+                    tempString = " ".join(lines[i + 1:i + 4])
+                    if EYE_AND_TEST_PATTERN.match(tempString):
+                        tempEyeAndGridArray = tempString.split("Single Field Analysis")
+                        patient_details["Eye"] = tempEyeAndGridArray[0].strip()
+                        patient_details["Test Type"] = tempEyeAndGridArray[1].strip()
+                        patient_details["Grid"] = tempEyeAndGridArray[1].strip().split(" ")[1].strip()
+
+            # Check for visual field metrics (MD, PSD, etc.), which all end in dB
+            if "db" in line.lower():
+                for metric, pattern in METRIC_PATTERNS:
+                    if metric in line:
+                        match = pattern.search(line)
+                        if match:
+                            patient_details[metric] = match.group(1) + " dB"
+
+            i = i + 1
+
+    return patient_details
+
+
+# Layout matching tolerances, in points: how far apart the left edges of
+# lines in one column may be, and how far right of its label a value on
+# the same row may start
+COLUMN_TOLERANCE = 3
+ROW_GAP = 100
+
+# Height of the row buckets of the spatial index, in points
+ROW_BUCKET = 4
+
+SINGLE_FIELD_ANALYSIS = "Single Field Analysis"
+
+
+def clean_value(value, trim_db=False):
+    """
+    Normalize a field value the way parse_patient_details does; with
+    trim_db a value in dB loses what follows the unit
+    """
+    if trim_db and "dB" in value:
+        match = DB_VALUE_PATTERN.match(value)
+        if match:
+            value = match.group()
+    return value.replace(",", "").strip()
+
+
+class PageLayout:
+    """
+    Text lines of one page with their positions, indexed so that the value
+    of every label is found by lookup instead of by scanning lines.
+    
+    Lines come from page.get_text("words") grouped by PyMuPDF line, in the
+    order get_text() prints them. Each is a (text, x0, y0, x1, y1) tuple.
+    Three indexes are built over them:
+      rows:    row bucket -> lines whose vertical center falls in it
+      columns: line -> (its column, its position in that column), columns
+               being lines with aligned left edges sorted top to bottom
+      labels:  "Label:" lines, with their inline value when they have one
+    """
+    
+    def __init__(self, page):
+        grouped = {}
+        for x0, y0, x1, y1, word, block_no, line_no, _ in page.get_text("words"):
+            line = grouped.get((block_no, line_no))
+            if line is None:
+                grouped[(block_no, line_no)] = [[word], x0, y0, x1, y1]
+            else:
+                line[0].append(word)
+                line[1], line[2] = min(line[1], x0), min(line[2], y0)
+                line[3], line[4] = max(line[3], x1), max(line[4], y1)
+        
+        self.lines = [(" ".join(words), x0, y0, x1, y1) for words, x0, y0, x1, y1 in grouped.values()]
+        
+        self.rows = {}
+        for line in self.lines:
+            center = (line[2] + line[4]) / 2
+            self.rows.setdefault(int(center // ROW_BUCKET), []).append(line)
+        
+        self.columns = {}
+        column = []
+        for line in sorted(self.lines, key=lambda line: line[1]):
+            if column and line[1] - column[0][1] > COLUMN_TOLERANCE:
+                self.add_column(column)
+                column = []
+            column.append(line)
+        if column:
+            self.add_column(column)
+        
+        # Label and inline value of every "Label:" and "Label: value" line
+        self.labels = {}
+        for line in self.lines:
+            if ":" in line[0]:
+                label, value = line[0].split(":", 1)
+                self.labels[line] = (label, value.strip())
+    
+    def add_column(self, lines):
+        column = sorted(lines, key=lambda line: line[2])
+        for position, line in enumerate(column):
+            self.columns[line] = (column, position)
+    
+    def is_label(self, line):
+        return line in self.labels
+    
+    def is_bare_label(self, line):
+        """
+        Whether line is a "Label:" line with its value elsewhere
+        """
+        return line in self.labels and self.labels[line][1] == ""
+    
+    def row_value(self, line):
+        """
+        Nearest non-label line to the right of line on the same row
+        """
+        text, x0, y0, x1, y1 = line
+        best = None
+        for bucket in range(int(y0 // ROW_BUCKET), int(y1 // ROW_BUCKET) + 1):
+            for other in self.rows.get(bucket, ()):
+                center = (other[2] + other[4]) / 2
+                if not (y0 <= center <= y1) or other[1] < x1 - 1 or other[1] - x1 > ROW_GAP:
+                    continue
+                if self.is_label(other):
+                    continue
+                if best is None or other[1] < best[1]:
+                    best = other
+        return best
+    
+    def column_neighbor(self, line, offset):
+        """
+        Line offset places below (or above, if negative) line in its column
+        """
+        column, position = self.columns[line]
+        position += offset
+        return column[position] if 0 <= position < len(column) else None
+    
+    def block_values(self, line):
+        """
+        Values of a block of "Label:" lines stacked in a column with their
+        values listed under the block, as {label line: value line}
+        """
+        column, position = self.columns[line]
+        start = end = position
+        while start > 0 and self.is_bare_label(column[start - 1]):
+            start -= 1
+        while end + 1 < len(column) and self.is_bare_label(column[end + 1]):
+            end += 1
+        
+        values = {}
+        index = end + 1
+        for label_line in column[start:end + 1]:
+            if index >= len(column) or self.is_label(column[index]):
+                break
+            value_line = column[index]
+            # A report without a pupil diameter leaves its value out
+            if self.labels[label_line][0] == "Pupil Diameter" and "mm" not in value_line[0]:
+                continue
+            values[label_line] = value_line
+            index += 1
+        return values
+    
+    def details(self):
+        """
+        Parse the page into a dict of PATIENT_FIELDS; fields not on the page
+        are None
+        """
+        patient_details = dict.fromkeys(PATIENT_FIELDS)
+        blocks = {}
+        
+        for line in self.lines:
+            text = line[0]
             
-            # Check for visual field metrics (MD, PSD, etc.)
-            for metric in ["MD", "PSD", "VFI", "SF", "CPSD", "MD10-2", "PSD10-2"]:
-                if metric in lines[i]:
-                    # Try to extract the value with dB unit
-                    match = re.search(r'{}[:\s]*([-+]?\d+\.\d+)\s*dB'.format(metric), lines[i], re.IGNORECASE)
-                    if match:
-                        patient_details[metric] = match.group(1) + " dB"
+            if line in self.labels:
+                label, value = self.labels[line]
+                if label not in patient_details:
+                    continue
+                if value == "":
+                    # The value is on the same row, or under the label block
+                    value_line = self.row_value(line)
+                    if value_line is None:
+                        if line not in blocks:
+                            blocks.update(self.block_values(line))
+                        value_line = blocks.get(line)
+                    if value_line is None:
+                        continue
+                    patient_details[label] = clean_value(value_line[0], trim_db=True)
+                else:
+                    patient_details[label] = clean_value(value)
+                continue
             
-            i = i + 1
+            if text[:1] in ADDRESS_START:
+                match = ADDRESS_PATTERN.match(text)
+                if match:
+                    patient_details["Office Location"] = match.group()
+            
+            if SINGLE_FIELD_ANALYSIS in text:
+                self.parse_test_type(line, patient_details)
+            
+            # Visual field metrics (MD, PSD, etc.) all end in dB
+            if "db" in text.lower():
+                for metric, pattern in METRIC_PATTERNS:
+                    if metric in text:
+                        match = pattern.search(text)
+                        if match:
+                            patient_details[metric] = match.group(1) + " dB"
+        
+        return patient_details
+    
+    def column_text(self, line, offset):
+        """
+        Text of the line offset places from line in its column, or "" when
+        there is none or it is a "Label:" line
+        """
+        other = self.column_neighbor(line, offset)
+        if other is None or self.is_label(other):
+            return ""
+        return other[0].strip()
+    
+    def parse_test_type(self, line, patient_details):
+        """
+        Eye and test type around the "Single Field Analysis" title: on the
+        same line, or the lines above and below it in its column
+        """
+        eye, test_type = (part.strip() for part in line[0].split(SINGLE_FIELD_ANALYSIS, 1))
+        if not eye:
+            eye = self.column_text(line, -1)
+        if not test_type:
+            test_type = self.column_text(line, 1)
+        
+        patient_details["Eye"] = eye or None
+        patient_details["Test Type"] = test_type or None
+        grid = test_type.split(" ")
+        patient_details["Grid"] = grid[1].strip() if len(grid) > 1 else None
 
-    if patient_details["Patient ID"]:
-        # response = {'status': True, 'data': json.dumps(patient_details)}
-        response = "[(1)]" + json.dumps(patient_details)
-        return response
-    else:
-        # response = {'status': False, 'data': json.dumps(patient_details)}
-        response = "[(0)]" + json.dumps(patient_details)
-        return response
+
+def parse_layout_details(doc, max_pages=None, required_fields=None):
+    """
+    Parse patient details from the text layout of an open fitz document
+    (or a list of its pages).
+    
+    Pages are parsed one at a time (see PageLayout) and merged, values on
+    later pages replacing earlier ones. With required_fields set, reading
+    stops at the first page by which all of them have a value; the report
+    header is on the first page, so later pages of multi-page printouts
+    are usually never extracted.
+    """
+    patient_details = dict.fromkeys(PATIENT_FIELDS)
+    
+    for page in islice(doc, max_pages):
+        with span("text"):
+            layout = PageLayout(page)
+        with span("parse"):
+            page_details = layout.details()
+        
+        for field, value in page_details.items():
+            if value is not None:
+                patient_details[field] = value
+        
+        if required_fields and all(patient_details[field] for field in required_fields):
+            break
+    
+    return patient_details
+
+
+def extract_text_from_pdf(file_path, max_pages=None, early_exit=False, page_number=None):
+    """
+    Parse the patient details of a PDF from its text layout in one call.
+    
+    Only the first max_pages pages are read when it is set. With early_exit
+    pages are read one at a time until the CRITICAL_FIELDS are found (see
+    parse_layout_details). With page_number (1-based) set only that page
+    is read, for PDFs holding one report per page.
+    
+    file_path may also be the bytes of the PDF.
+    
+    Returns the same "[(status)]{json}" string as get_text_from_pdf; being a
+    module-level function it can be dispatched to a worker process.
+    """
+    doc = open_pdf(file_path)  # open document
+    try:
+        required_fields = CRITICAL_FIELDS if early_exit else None
+        pages = doc if page_number is None else [doc[page_number - 1]]
+        patient_details = parse_layout_details(pages, max_pages, required_fields)
+    finally:
+        doc.close()
+    
+    return format_text_result(patient_details)
+
+
+def find_report_pages(file_path, first_page=1, last_page=None):
+    """
+    Split pages first_page to last_page (1-based, inclusive; None reads to
+    the end) of a PDF into report pages, those laid out as a single field
+    analysis printout, and other pages (cover sheets, blank pages, other
+    printouts).
+    
+    Returns (report page numbers, other page numbers).
+    """
+    doc = open_pdf(file_path)
+    try:
+        last_page = doc.page_count if last_page is None else min(last_page, doc.page_count)
+        report_pages = []
+        other_pages = []
+        for page_number in range(first_page, last_page + 1):
+            with span("text"):
+                text = doc[page_number - 1].get_text()
+            if SINGLE_FIELD_ANALYSIS in text:
+                report_pages.append(page_number)
+            else:
+                other_pages.append(page_number)
+    finally:
+        doc.close()
+    
+    return report_pages, other_pages
 
 
 if __name__ == "__main__":
     # file_path = "patients/patient_1"
     pdf_file = sys.argv[1]
-    txt_data = convert_pdf_to_txt(pdf_file)
+    txt_data = convert_pdf_to_str(pdf_file)
     patient_details = get_text_from_pdf(txt_data)
 
     print(patient_details)
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+import os
+import threading
+import time
+
+from utils.executor import executor
+
+
+# Warm up PyMuPDF, the region masks and the encoders before reporting ready
+# (0 reports ready as soon as the server is up)
+WARMUP = os.environ.get("WARMUP", "1") == "1"
+
+# Tiny synthetic report run through every extraction path by the warm-up
+WARMUP_PDF = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "assets", "warmup.pdf")
+
+
+def warm_up(pdf_file=WARMUP_PDF):
+    """
+    Extract text, grids and images of pdf_file once in this process, so
+    imports, fonts, the renderer, the region masks and the image encoders
+    are initialized before the first request.
+
+    Also used as the initializer of the PDF worker processes, so it never
+    raises: a failed warm-up only leaves the process cold.
+    """
+    # Imported here: worker processes load these modules on warm-up
+    from utils.document import analyze_pdf
+    from utils.grid_extractor import extract_grids_from_pdf
+    from utils.image_extractor import extract_images_from_pdf
+
+    try:
+        with open(pdf_file, "rb") as f:
+            data = f.read()
+        analyze_pdf(data, None)
+        extract_images_from_pdf(data, None)
+        extract_grids_from_pdf(data)
+    except Exception as e:
+        print(f"Error warming up with {pdf_file}: {e}")
+
+
+class Readiness:
+    """
+    Warms the service up on a background thread and tells when it is done.
+
+    With workers the warm-up starts every PDF worker process, each running
+    warm_up before taking tasks; without, warm_up runs in the server
+    process. The server answers requests meanwhile, only /ready reports it
+    is not ready yet.
+    """
+
+    def __init__(self, enabled=WARMUP):
+        self.enabled = enabled
+        self.import_seconds = None
+        self.warmup_seconds = None
+        self.workers_started = 0
+        self._ready = threading.Event()
+        self._thread = None
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    def warm_up(self):
+        start = time.perf_counter()
+        try:
+            if self.enabled:
+                if executor.workers <= 0:
+                    warm_up()
+                self.workers_started = executor.start(warm_up)
+            else:
+                self.workers_started = executor.start()
+        except Exception as e:
+            print(f"Error starting PDF workers: {e}")
+        self.warmup_seconds = time.perf_counter() - start
+        self._ready.set()
+        print(f"Ready: imports took {self.import_seconds or 0:.2f} s, warm-up {self.warmup_seconds:.2f} s "
+              f"({self.workers_started} PDF workers)")
+
+    def start(self):
+        """
+        Warm up on a daemon thread
+        """
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self.warm_up, name="warm-up", daemon=True)
+        self._thread.start()
+
+    def stats(self):
+        return {
+            "ready": self.ready,
+            "import_seconds": self.import_seconds,
+            "warmup_seconds": self.warmup_seconds,
+            "workers_started": self.workers_started,
+        }
+
+
+# Shared readiness state of the server process
+readiness = Readiness()